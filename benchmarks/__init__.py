@@ -0,0 +1,4 @@
+"""
+性能計測用ベンチマーク
+実サイトにはアクセスせず、ローカルのスタブサーバーに対して計測する
+"""
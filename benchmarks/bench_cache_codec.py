@@ -0,0 +1,91 @@
+"""
+キャッシュした検索結果の保存形式を比較するベンチマーク
+
+3店舗のフィクスチャから抽出した商品を件数分に複製した結果リストについて、
+旧形式（JSONFieldに保存されるJSON）とコンパクト形式（codec.encode_results）の
+1行あたりのサイズ・デコード時間・エンコード時間を比較する。
+キャッシュの結果は ProductResult として使うため、旧形式のデコードは辞書まで（json.loads）と
+ProductResult まで（SearchCache.results の旧形式の処理と同じ）の両方を計測する。
+
+    python -m benchmarks.bench_cache_codec --sizes 50 200 1000 --rounds 200
+"""
+import argparse
+import json
+import time
+
+from .common import load_fixture, setup_django
+
+setup_django()
+
+from myapp.codec import decode_results, encode_results  # noqa: E402
+from myapp.scrapers.result import ProductResult  # noqa: E402
+from myapp.scrapers.sites import ChampCameraScraper, JCameraScraper, KitamuraScraper  # noqa: E402
+
+STORES = {
+    'kitamura': KitamuraScraper,
+    'champcamera': ChampCameraScraper,
+    'jcamera': JCameraScraper,
+}
+
+
+def _sample_results():
+    """フィクスチャから抽出した商品（スクレイパーの format_result 済み）"""
+    items = []
+    for store, scraper_class in STORES.items():
+        scraper = scraper_class()
+        extracted, _ = scraper.extract(load_fixture(store))
+        items.extend(scraper.format_result(extracted))
+    return items
+
+
+def _build_results(samples, size: int):
+    """商品URLが重複しないように複製して件数分の結果リストを作る"""
+    return [dict(samples[index % len(samples)], product_url=f"{samples[index % len(samples)]['product_url']}?n={index}",
+                 price=samples[index % len(samples)]['price'] + index)
+            for index in range(size)]
+
+
+def _time_per_call(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def run(sizes, rounds: int) -> None:
+    samples = _sample_results()
+    print(f"sample items: {len(samples)}   rounds: {rounds}")
+    print("json = JSONField encoding (json.dumps defaults), compact = codec.encode_results")
+    print("json dec = json.loads to dicts, json rec = json.loads then ProductResult.from_dict, "
+          "compact dec = codec.decode_results (ProductResult)")
+    print(f"\n{'items':>6} {'json KiB':>9} {'compact KiB':>12} {'ratio':>6} "
+          f"{'json dec ms':>12} {'json rec ms':>12} {'compact dec ms':>15} {'json enc ms':>12} {'compact enc ms':>15}")
+
+    for size in sizes:
+        results = _build_results(samples, size)
+        encoded_json = json.dumps(results)
+        encoded = encode_results(results)
+        assert decode_results(encoded) == json.loads(encoded_json) == results
+
+        json_decode = _time_per_call(lambda: json.loads(encoded_json), rounds)
+        json_records = _time_per_call(lambda: [ProductResult.from_dict(result) for result in json.loads(encoded_json)],
+                                      rounds)
+        compact_decode = _time_per_call(lambda: decode_results(encoded), rounds)
+        json_encode = _time_per_call(lambda: json.dumps(results), rounds)
+        compact_encode = _time_per_call(lambda: encode_results(results), rounds)
+        json_size = len(encoded_json.encode('utf-8'))
+        print(f"{size:>6} {json_size / 1024:>9.1f} {len(encoded) / 1024:>12.1f} {json_size / len(encoded):>6.1f} "
+              f"{json_decode * 1000:>12.3f} {json_records * 1000:>12.3f} {compact_decode * 1000:>15.3f} "
+              f"{json_encode * 1000:>12.3f} {compact_encode * 1000:>15.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+    run(args.sizes, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+検索パイプライン全体のオフラインベンチマーク
+
+店舗サイトの代わりにフィクスチャを返すローカルのスタブサーバー（遅延・エラー注入付き）に
+各スクレイパーを向け、実際の取得・パース・キャッシュ保存を通して以下を計測する。
+
+- search_all_sites / search_api ビューのレイテンシ（p50 / p95 / p99）とスループット
+- 1ページあたりのパース・抽出時間
+- メモリ確保（tracemallocのピーク・確保ブロック数）
+
+データベースはDjangoのテスト用データベースを作成して使用し、終了時に破棄する。
+
+    python -m benchmarks.bench_e2e --searches 60 --concurrency 8 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+from unittest import mock
+from urllib.parse import urlsplit
+
+from .common import load_fixture, print_table, setup_django, summarize
+from .stub_server import StubServer
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from myapp.cache import memory_cache  # noqa: E402
+from myapp.scrapers import executor  # noqa: E402
+from myapp.scrapers.httpcache import get_http_cache  # noqa: E402
+from myapp.scrapers.session import close_session  # noqa: E402
+from myapp.scrapers.sites import ChampCameraScraper, JCameraScraper, KitamuraScraper  # noqa: E402
+from myapp.utils import search_all_sites  # noqa: E402
+
+STORES = {
+    'kitamura': KitamuraScraper,
+    'champcamera': ChampCameraScraper,
+    'jcamera': JCameraScraper,
+}
+
+
+def _stub_pages() -> dict:
+    """検索URLのパス -> フィクスチャ（2ページ目以降も同じフィクスチャを返す）"""
+    return {
+        urlsplit(scraper_class().search_url_template).path: load_fixture(store)
+        for store, scraper_class in STORES.items()
+    }
+
+
+def _stub_scrapers(server: StubServer, backend: str, max_pages: int):
+    """スタブサーバーに向けたスクレイパーを生成するファクトリ（get_all_scrapers の差し替え用）"""
+    def factory():
+        scrapers = []
+        for scraper_class in STORES.values():
+            scraper = scraper_class()
+            parts = urlsplit(scraper.search_url_template)
+            scraper.base_url = server.url('/')
+            scraper.search_url_template = server.url(f"{parts.path}?{parts.query}")
+            scraper.parser_backend = backend
+            scraper.max_pages = max_pages
+            # スタブ相手にレート制限はかけない
+            scraper.delay = 0
+            scrapers.append(scraper)
+        return scrapers
+    return factory
+
+
+async def _drive(label: str, searches: int, concurrency: int, call) -> tuple:
+    """call(i) を同時実行数 concurrency で searches 回実行し、(ラベル, 各回の所要時間, 全体の所要時間) を返す"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(i)
+            samples.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(searches)))
+    return label, samples, time.perf_counter() - start
+
+
+async def _run_pipeline(args) -> None:
+    client = AsyncClient()
+    search_api_url = reverse('search_api')
+    
+    async def via_utils(i):
+        await search_all_sites(f'eos r{i}', use_cache=False)
+    
+    async def via_view(i):
+        response = await client.post(search_api_url, json.dumps({'keyword': f'nikon z{i}'}),
+                                     content_type='application/json')
+        assert response.status_code == 200, response.status_code
+    
+    async with StubServer(latency=args.latency, pages=_stub_pages(),
+                          error_rate=args.error_rate, error_status=args.error_status) as server:
+        with mock.patch('myapp.utils.get_all_scrapers', _stub_scrapers(server, args.backend, args.max_pages)), \
+                contextlib.redirect_stdout(io.StringIO()):
+            # ワーカープロセスの起動・接続確立を計測から除外する
+            await search_all_sites('warmup', use_cache=False)
+            
+            runs = [
+                await _drive('search_all_sites', args.searches, args.concurrency, via_utils),
+                await _drive('search_api view', args.searches, args.concurrency, via_view),
+            ]
+            
+            # 1検索あたりのメモリ確保（パース用ワーカー内の確保は含まない）
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            await search_all_sites('alloc probe', use_cache=False)
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await close_session()
+        
+        requests, errors = server.request_count, server.error_count
+    
+    rows = {}
+    for label, samples, elapsed in runs:
+        stats = summarize(samples)
+        rows[label] = {key: stats[key] for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')}
+        rows[label]['req/s'] = len(samples) / elapsed
+    print_table(f"{args.searches} searches x2, concurrency {args.concurrency}, stub latency "
+                f"{args.latency * 1000:.0f}ms, error rate {args.error_rate:.0%}, max pages {args.max_pages}", rows)
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    print(f"\nstub requests: {requests} (injected errors: {errors})")
+    print(f"per search (event loop process): peak {peak / 1024:.0f} KiB, {blocks} blocks allocated and kept")
+
+
+def _run_parse(args) -> None:
+    """1ページあたりのパース・抽出時間とメモリ確保"""
+    rows = {}
+    for store, scraper_class in STORES.items():
+        html = load_fixture(store)
+        scraper = scraper_class()
+        scraper.parser_backend = args.backend
+        
+        samples = []
+        for _ in range(args.parse_rounds):
+            start = time.perf_counter()
+            scraper.extract(html)
+            samples.append(time.perf_counter() - start)
+        
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        items, _ = scraper.extract(html)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+        
+        stats = summarize(samples)
+        rows[f"{store} ({len(items)} items)"] = {
+            'p50_ms': stats['p50_ms'],
+            'p99_ms': stats['p99_ms'],
+            'peak_KiB': peak / 1024,
+            'blocks': blocks,
+        }
+    print_table(f"parse + extract per page, backend={args.backend}", rows)
+
+
+def run(args) -> None:
+    settings.SCRAPER_PARSE_EXECUTOR = {'KIND': args.executor, 'MAX_WORKERS': None, 'START_METHOD': 'spawn'}
+    # 実行毎に同じURLを取得してもパースし直すよう、HTTPキャッシュは無効にする
+    settings.SCRAPER_HTTP_CACHE = {'MAX_ENTRIES': 0}
+    
+    _run_parse(args)
+    
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        memory_cache.clear()
+        get_http_cache().clear()
+        asyncio.run(_run_pipeline(args))
+    finally:
+        executor.shutdown_executor()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.02, help='stub server latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub responses that fail')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--max-pages', type=int, default=1)
+    parser.add_argument('--backend', default='lxml')
+    parser.add_argument('--executor', default='process', choices=[executor.PROCESS, executor.THREAD, executor.INLINE])
+    parser.add_argument('--parse-rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+パース用エグゼキュータの効果を計測するベンチマーク
+
+多数の同時検索（フィクスチャを返す疑似フェッチ＋実際のパース・抽出）を実行し、
+エグゼキュータの種類・ワーカー数毎に以下を計測する。
+
+- イベントループの応答性: 一定間隔で起床するティッカーの遅延（最大・p99）
+- スループット: 1秒あたりに処理できた検索ページ数（マルチコアでのスケール）
+
+    python -m benchmarks.bench_parse_pool --searches 60 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from .common import load_fixture, setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+
+from myapp.scrapers import executor  # noqa: E402
+from myapp.scrapers.httpcache import FetchResult, get_http_cache  # noqa: E402
+from myapp.scrapers.sites import ChampCameraScraper, JCameraScraper, KitamuraScraper  # noqa: E402
+
+STORES = [
+    (KitamuraScraper, 'kitamura'),
+    (ChampCameraScraper, 'champcamera'),
+    (JCameraScraper, 'jcamera'),
+]
+
+TICK_INTERVAL = 0.005
+
+
+def _scraper_with_page(scraper_class, html: str, backend: str, fetch_latency: float):
+    """フィクスチャを疑似遅延付きで返すように fetch を差し替えたスクレイパーを生成"""
+    scraper = scraper_class()
+    scraper.parser_backend = backend
+    # 1検索 = 1ページとして計測する（ページ送りは辿らない）
+    scraper.max_pages = 1
+    
+    async def fetch(url, conditional_headers=None):
+        await asyncio.sleep(fetch_latency)
+        return FetchResult(200, html)
+    
+    scraper.fetch = fetch
+    return scraper
+
+
+async def _ticker(lags: list, stop: asyncio.Event) -> None:
+    """一定間隔で起床し、予定時刻からの遅れを記録"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(loop.time() - expected)
+
+
+async def _run_once(pages: dict, searches: int, backend: str, fetch_latency: float) -> tuple:
+    # ワーカーの起動コストを計測から除外する
+    await executor.run_in_parse_executor(len, 'warmup')
+    
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    scrapers = [
+        _scraper_with_page(scraper_class, pages[fixture], backend, fetch_latency)
+        for scraper_class, fixture in (STORES[i % len(STORES)] for i in range(searches))
+    ]
+    
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # HTTPキャッシュで抽出結果が再利用されないよう検索毎にURLを変える
+        await asyncio.gather(*(scraper.search(f'eos {i}') for i, scraper in enumerate(scrapers)))
+    elapsed = time.perf_counter() - start
+    
+    stop.set()
+    await ticker
+    return elapsed, lags
+
+
+def run(searches: int, workers: list, backend: str, fetch_latency: float) -> None:
+    pages = {fixture: load_fixture(fixture) for _, fixture in STORES}
+    configs = [('inline', executor.INLINE, None)]
+    configs += [(f'thread x{n}', executor.THREAD, n) for n in workers]
+    configs += [(f'process x{n}', executor.PROCESS, n) for n in workers]
+    
+    print(f"{searches} concurrent searches, backend={backend}, fetch latency {fetch_latency * 1000:.0f}ms, "
+          f"{os.cpu_count()} CPUs")
+    print(f"\n{'executor':<14} {'total s':>8} {'pages/s':>8} {'lag max ms':>11} {'lag p99 ms':>11}")
+    
+    for label, kind, max_workers in configs:
+        settings.SCRAPER_PARSE_EXECUTOR = {'KIND': kind, 'MAX_WORKERS': max_workers, 'START_METHOD': 'spawn'}
+        executor.shutdown_executor()
+        get_http_cache().clear()
+        elapsed, lags = asyncio.run(_run_once(pages, searches, backend, fetch_latency))
+        executor.shutdown_executor()
+        
+        p99 = statistics.quantiles(lags, n=100, method='inclusive')[98] if len(lags) >= 2 else max(lags, default=0)
+        print(f"{label:<14} {elapsed:>8.2f} {searches / elapsed:>8.1f} "
+              f"{max(lags, default=0) * 1000:>11.1f} {p99 * 1000:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=60)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--backend', default='lxml')
+    parser.add_argument('--fetch-latency', type=float, default=0.01, help='simulated fetch latency in seconds')
+    args = parser.parse_args()
+    run(args.searches, args.workers, args.backend, args.fetch_latency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+HTMLパーサーバックエンドのスループットを計測するベンチマーク
+
+3店舗の検索結果ページのフィクスチャを、バックエンド毎に
+全体パース / 商品一覧の部分木のみのパース / パース＋商品抽出（スクレイパーのextract）で計測し、
+パース時のメモリ確保量のピークも比較する。
+
+    python -m benchmarks.bench_parsers --rounds 50
+"""
+import argparse
+import time
+import tracemalloc
+
+from .common import load_fixture, setup_django
+
+setup_django()
+
+from myapp.scrapers.parsers import PARSER_BACKENDS, parse_document, resolve_backend  # noqa: E402
+from myapp.scrapers.sites import ChampCameraScraper, JCameraScraper, KitamuraScraper  # noqa: E402
+
+STORES = {
+    'kitamura': KitamuraScraper,
+    'champcamera': ChampCameraScraper,
+    'jcamera': JCameraScraper,
+}
+
+
+def _time_per_page(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def _peak_kib(func) -> float:
+    """関数実行中のメモリ確保量のピーク（KiB）"""
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def run(rounds: int) -> None:
+    backends = [backend for backend in PARSER_BACKENDS if resolve_backend(backend) == backend]
+    print(f"backends: {', '.join(backends)}   rounds: {rounds}")
+    print("full = whole document tree, strained = product container subtree only")
+    print(f"\n{'store':<12} {'backend':<12} {'items':>5} {'full ms':>8} {'strained ms':>12} "
+          f"{'+extract ms':>12} {'pages/s':>8} {'full KiB':>9} {'strained KiB':>13}")
+    
+    for store, scraper_class in STORES.items():
+        html = load_fixture(store)
+        container = scraper_class.product_container_selector
+        for backend in backends:
+            scraper = scraper_class()
+            scraper.parser_backend = backend
+            items, _ = scraper.extract(html)
+            full = _time_per_page(lambda: parse_document(html, backend), rounds)
+            strained = _time_per_page(lambda: parse_document(html, backend, only=container), rounds)
+            total = _time_per_page(lambda: scraper.extract(html), rounds)
+            full_kib = _peak_kib(lambda: parse_document(html, backend))
+            strained_kib = _peak_kib(lambda: parse_document(html, backend, only=container))
+            print(f"{store:<12} {backend:<12} {len(items):>5} {full * 1000:>8.2f} {strained * 1000:>12.2f} "
+                  f"{total * 1000:>12.2f} {1 / total:>8.1f} {full_kib:>9.0f} {strained_kib:>13.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+    run(args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+検索結果レコードの形式を比較するベンチマーク
+
+3店舗のフィクスチャから抽出した商品の値を件数分に複製し、抽出→整形→マージ→価格順の並べ替え→JSON化
+の流れを、従来の辞書による処理（整形・マージの度に辞書やリストをコピー）と ProductResult による処理で比較する。
+時間・メモリ確保のピーク（tracemalloc）・レコード1件のサイズを出力する。
+
+    python -m benchmarks.bench_result_records --sizes 300 3000 30000 --rounds 20
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from .common import load_fixture, setup_django
+
+setup_django()
+
+from myapp.scrapers.result import FIELDS, ProductResult, ResultJSONEncoder  # noqa: E402
+from myapp.scrapers.sites import ChampCameraScraper, JCameraScraper, KitamuraScraper  # noqa: E402
+from myapp.utils import merge_search_results  # noqa: E402
+
+SCRAPERS = {
+    'kitamura': KitamuraScraper,
+    'champcamera': ChampCameraScraper,
+    'jcamera': JCameraScraper,
+}
+
+# ソース名 -> スクレイパー（format_result の呼び出し用）
+SCRAPER_INSTANCES = {scraper_class.__name__: scraper_class() for scraper_class in SCRAPERS.values()}
+
+
+def _extracted_values(size: int):
+    """サイト毎の抽出済みの値（項目値のタプル、ソース名を除く）を合計件数分用意する"""
+    per_site = {}
+    for store, scraper_class in SCRAPERS.items():
+        scraper = scraper_class()
+        items, _ = scraper.extract(load_fixture(store))
+        values = [tuple(getattr(item, field) for field in FIELDS[:-1]) for item in items]
+        count = size // len(SCRAPERS)
+        per_site[scraper.name] = [values[index % len(values)][:4] + (f'{values[index % len(values)][4]}?n={index}',)
+                                  for index in range(count)]
+    return per_site
+
+
+def build_dicts(per_site) -> list:
+    """従来の処理: 抽出で辞書を作り、整形で辞書を、マージでリストを作り直し、ラムダで並べ替える"""
+    results_dict = {}
+    for name, values in per_site.items():
+        extracted = [dict(zip(FIELDS[:-1], row)) for row in values]
+        results_dict[name] = [{
+            'title': item.get('title', ''),
+            'price': item.get('price', 0),
+            'condition': item.get('condition', ''),
+            'image_url': item.get('image_url', ''),
+            'product_url': item.get('product_url', ''),
+            'source': name,
+        } for item in extracted]
+    merged = []
+    for site_results in results_dict.values():
+        merged.extend(site_results)
+    return sorted(merged, key=lambda x: x.get('price', 0))
+
+
+def build_records(per_site) -> list:
+    """ProductResult による処理: 抽出時にレコードを作り、以降はコピーせずにJSON化の時点で辞書にする"""
+    results_dict = {}
+    for name, values in per_site.items():
+        extracted = [ProductResult(*row, source=name) for row in values]
+        results_dict[name] = SCRAPER_INSTANCES[name].format_result(extracted)
+    return merge_search_results(results_dict, sort_by_price=True)
+
+
+PIPELINES = {
+    'dict': (build_dicts, lambda results: json.dumps({'results': results}, ensure_ascii=False)),
+    'ProductResult': (build_records,
+                      lambda results: json.dumps({'results': results}, ensure_ascii=False, cls=ResultJSONEncoder)),
+}
+
+
+def _measure(build, serialize, per_site, rounds: int):
+    """1回あたりの時間と、並べ替えまで・JSON化までのメモリ確保のピーク"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        serialize(build(per_site))
+    elapsed = (time.perf_counter() - start) / rounds
+    tracemalloc.start()
+    results = build(per_site)
+    build_peak = tracemalloc.get_traced_memory()[1]
+    output = serialize(results)
+    total_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, build_peak, total_peak, output
+
+
+def run(sizes, rounds: int) -> None:
+    sample = ProductResult('Canon EOS R5', 398000, 'A', 'https://example.com/i.jpg', 'https://example.com/p/1',
+                           'KitamuraScraper')
+    print(f"record size: dict {sys.getsizeof(sample.to_dict())} B / ProductResult {sys.getsizeof(sample)} B "
+          f"(excluding shared values)   rounds: {rounds}")
+    print("sorted = peak until the merged list is sorted, json = peak including the JSON response body")
+    print(f"\n{'items':>6} {'pipeline':<14} {'ms':>8} {'sorted KiB':>11} {'json KiB':>9}")
+    for size in sizes:
+        per_site = _extracted_values(size)
+        outputs = []
+        for label, (build, serialize) in PIPELINES.items():
+            elapsed, build_peak, total_peak, output = _measure(build, serialize, per_site, rounds)
+            outputs.append(json.loads(output))
+            print(f"{size:>6} {label:<14} {elapsed * 1000:>8.2f} {build_peak / 1024:>11.0f} {total_peak / 1024:>9.0f}")
+        assert outputs[0] == outputs[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[300, 3000, 30000])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+共有セッションの効果を計測するベンチマーク
+
+検索毎に新しいClientSessionを作る従来方式と、共有セッション（接続プール）を
+使う方式で、同一ホストへの繰り返し検索のレイテンシを比較する。
+
+    python -m benchmarks.bench_session_pool --searches 200 --latency 0.005
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from .common import print_table, setup_django, summarize
+from .stub_server import StubServer
+
+setup_django()
+
+from myapp.scrapers.base import BaseScraper  # noqa: E402
+from myapp.scrapers.session import close_session  # noqa: E402
+
+
+class _BenchScraper(BaseScraper):
+    """遅延なしで get_html のみを使う計測用スクレイパー"""
+    
+    def __init__(self):
+        super().__init__(delay_seconds=0)
+    
+    async def search(self, keyword):
+        return []
+    
+    def extract_items(self, soup):
+        return []
+
+
+async def _fetch_with_fresh_session(url: str, headers: dict) -> str:
+    """従来方式: 取得毎にセッションを生成・破棄"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url, headers=headers, timeout=30) as response:
+            return await response.text()
+
+
+async def run(searches: int, latency: float) -> None:
+    scraper = _BenchScraper()
+    async with StubServer(latency=latency) as server:
+        url = server.url('/search?keyword=EOS+R5')
+        
+        fresh = []
+        for _ in range(searches):
+            start = time.perf_counter()
+            await _fetch_with_fresh_session(url, scraper.headers)
+            fresh.append(time.perf_counter() - start)
+        
+        pooled = []
+        for _ in range(searches):
+            start = time.perf_counter()
+            await scraper.get_html(url)
+            pooled.append(time.perf_counter() - start)
+        await close_session()
+    
+    fresh_stats = summarize(fresh)
+    pooled_stats = summarize(pooled)
+    print_table(f"{searches} sequential searches, stub latency {latency * 1000:.1f}ms", {
+        'session per fetch': fresh_stats,
+        'shared session': pooled_stats,
+    })
+    saved = fresh_stats['mean_ms'] - pooled_stats['mean_ms']
+    print(f"\nsaved per search: {saved:.2f}ms ({saved / fresh_stats['mean_ms'] * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='stub server latency in seconds')
+    args = parser.parse_args()
+    asyncio.run(run(args.searches, args.latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+ベンチマーク共通処理
+"""
+import os
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+# 店舗の検索結果ページを模したHTML（各スクレイパーのセレクタに合わせた構造）
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+def setup_django() -> None:
+    """Django設定を初期化（manage.pyと同じ既定の設定モジュールを使用）"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tool_project.settings')
+    import django
+    django.setup()
+
+
+def load_fixture(name: str) -> str:
+    """
+    HTMLフィクスチャを読み込む
+    
+    Args:
+        name (str): フィクスチャ名（'kitamura' / 'champcamera' / 'jcamera'）
+        
+    Returns:
+        str: HTML文字列
+    """
+    return (FIXTURES_DIR / f'{name}.html').read_text(encoding='utf-8')
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    計測値の要約統計を計算
+    
+    Args:
+        samples (List[float]): 計測値（秒）
+        
+    Returns:
+        Dict[str, float]: 平均・パーセンタイル（p50/p95/p99）・最小・最大（ミリ秒）
+    """
+    if len(samples) >= 2:
+        cuts = statistics.quantiles(samples, n=100, method='inclusive')
+        p95, p99 = cuts[94], cuts[98]
+    else:
+        p95 = p99 = max(samples)
+    return {
+        'mean_ms': statistics.mean(samples) * 1000,
+        'p50_ms': statistics.median(samples) * 1000,
+        'p95_ms': p95 * 1000,
+        'p99_ms': p99 * 1000,
+        'min_ms': min(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    """要約統計を表形式で出力"""
+    print(f"\n== {title} ==")
+    for name, stats in rows.items():
+        cells = '  '.join(f"{key}={value:8.2f}" for key, value in stats.items())
+        print(f"{name:<24} {cells}")
@@ -0,0 +1,100 @@
+"""
+ベンチマーク用スタブHTTPサーバー
+店舗サイトの代わりにローカルで固定HTMLを返す
+"""
+import asyncio
+import random
+from typing import Dict, Optional
+
+from aiohttp import web
+
+DEFAULT_HTML = """<html><body>
+<div class="product-list">
+  <div class="product-item">
+    <a class="product-link" href="/item/1"><span class="product-title">Canon EOS R5</span></a>
+    <span class="product-price">¥398,000</span>
+    <span class="product-condition">A</span>
+  </div>
+</div>
+</body></html>"""
+
+
+class StubServer:
+    """
+    固定HTMLを返すローカルHTTPサーバー
+    
+    async with StubServer(latency=0.01) as server:
+        url = server.url('/search')
+    
+    pages を指定するとパスの前方一致で返すHTMLを切り替え、
+    error_rate を指定すると一定割合のリクエストに error_status を返す
+    """
+    
+    def __init__(self, html: str = DEFAULT_HTML, latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0,
+                 pages: Optional[Dict[str, str]] = None,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int = 0):
+        """
+        初期化
+        
+        Args:
+            html (str): レスポンスとして返すHTML（pages に一致しないパスの場合）
+            latency (float): レスポンス前に挟む疑似遅延（秒）
+            host (str): 待ち受けホスト
+            port (int): 待ち受けポート（0で空きポートを自動割り当て）
+            pages (Dict[str, str], optional): パスの前方一致 -> HTML
+            error_rate (float): エラーを返すリクエストの割合（0〜1）
+            error_status (int): 注入するエラーのステータスコード（例: 500, 429）
+            seed (int): エラー注入の乱数シード（実行毎に同じリクエストが失敗する）
+        """
+        self.html = html
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.pages = dict(sorted((pages or {}).items(), key=lambda item: -len(item[0])))
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+    
+    def _page_for(self, path: str) -> str:
+        for prefix, html in self.pages.items():
+            if path.startswith(prefix):
+                return html
+        return self.html
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.error_count += 1
+            return web.Response(status=self.error_status, text='injected error')
+        return web.Response(text=self._page_for(request.path), content_type='text/html')
+    
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+    
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    def url(self, path: str = '/') -> str:
+        """スタブサーバー上のURLを生成"""
+        return f"http://{self.host}:{self.port}{path}"
+    
+    async def __aenter__(self) -> 'StubServer':
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
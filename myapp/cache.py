@@ -0,0 +1,201 @@
+"""
+検索結果の2層キャッシュ
+プロセス内のLRUキャッシュ（1層目）をSearchCacheテーブル（2層目）の前段に置く。
+ワーカープロセス間で共有される正はデータベース側とし、メモリ側は短いTTLで保持する。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from . import metrics
+from .models import SearchCache
+
+# 鮮度 -> キャッシュ計測の結果ラベル
+_CACHE_RESULTS = {SearchCache.FRESH: 'hit', SearchCache.STALE: 'stale'}
+
+# settings.SEARCH_MEMORY_CACHE で上書き可能なデフォルト値
+DEFAULT_MEMORY_CACHE_CONFIG = {
+    'MAX_ENTRIES': 1024,  # 保持する最大エントリ数（超過分は最も古く使われたものから破棄）
+    'TTL': 60,            # エントリの保持時間（秒）
+}
+
+
+class LRUCache:
+    """サイズ上限・TTL付きのスレッドセーフなLRUキャッシュ"""
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        """
+        初期化
+        
+        Args:
+            max_entries (int): 最大エントリ数
+            ttl (float): エントリの保持時間（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        値を取得（取得したエントリは最新使用として扱う）
+        
+        Returns:
+            Optional[Any]: 値、存在しないかTTL切れの場合はNone
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """値を格納（上限を超えた場合は最も古く使われたエントリを破棄）"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key: Hashable) -> None:
+        """値を削除"""
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        """全エントリと統計を初期化"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        利用統計を取得（サイズ調整用）
+        
+        Returns:
+            Dict[str, Any]: ヒット数・ミス数・ヒット率・破棄数・現在サイズ
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+            }
+
+
+def _create_memory_cache() -> LRUCache:
+    config = dict(DEFAULT_MEMORY_CACHE_CONFIG)
+    config.update(getattr(settings, 'SEARCH_MEMORY_CACHE', {}))
+    return LRUCache(max_entries=config['MAX_ENTRIES'], ttl=config['TTL'])
+
+
+# プロセス内キャッシュ: (キーワード, ソース名) -> (結果リスト, 有効期限, 再検証期限)
+memory_cache = _create_memory_cache()
+
+
+def remember(cache: SearchCache) -> List[Dict[str, Any]]:
+    """
+    データベースのキャッシュ行をメモリ層に格納
+    
+    Args:
+        cache (SearchCache): キャッシュ行
+        
+    Returns:
+        List[Dict[str, Any]]: デコード済みの検索結果リスト
+    """
+    results = cache.results
+    memory_cache.set((cache.keyword, cache.source), (results, cache.expires_at, cache.stale_until))
+    return results
+
+
+async def aget_cached_results(keyword: str, sources: Iterable[str]) -> Dict[str, Tuple[List[Dict[str, Any]], str]]:
+    """
+    メモリ層→データベース層の順に複数ソースのキャッシュを取得
+    メモリ層にない・メモリ層では期限切れのソースのみ1クエリでデータベースから取得し、メモリ層に格納する
+    
+    Args:
+        keyword (str): 検索キーワード
+        sources (Iterable[str]): ソース名
+        
+    Returns:
+        Dict[str, Tuple[List[Dict[str, Any]], str]]: ソース名をキーとした (検索結果リスト, 鮮度) の辞書
+    """
+    return (await aget_cached_results_many([keyword], sources))[keyword]
+
+
+async def aget_cached_results_many(keywords: Iterable[str],
+                                   sources: Iterable[str]) -> Dict[str, Dict[str, Tuple[List[Dict[str, Any]], str]]]:
+    """
+    複数キーワード分のキャッシュをまとめて取得（一括検索用）
+    メモリ層にない、またはメモリ層では期限切れ（STALE）の (キーワード, ソース) の組のみ
+    1クエリでデータベースから取得し、メモリ層に格納する
+    
+    Args:
+        keywords (Iterable[str]): 検索キーワード（キャッシュキー）
+        sources (Iterable[str]): ソース名
+        
+    Returns:
+        Dict[str, Dict[str, Tuple[List[Dict[str, Any]], str]]]: キーワード -> ソース名 -> (検索結果リスト, 鮮度)
+    """
+    sources = list(sources)
+    found = {keyword: {} for keyword in keywords}
+    missing = set()
+    rechecks = set()
+    
+    for keyword, keyword_found in found.items():
+        for source in sources:
+            entry = memory_cache.get((keyword, source))
+            if entry is not None:
+                results, expires_at, stale_until = entry
+                freshness = SearchCache.compute_freshness(expires_at, stale_until)
+                if freshness == SearchCache.FRESH:
+                    metrics.CACHE_REQUESTS.labels('memory', 'hit').inc()
+                    keyword_found[source] = (results, freshness)
+                    continue
+                if freshness == SearchCache.STALE:
+                    # 他のワーカーがデータベースの行を更新済みの場合があるため、
+                    # 再検証を始める前にデータベース層の有効期限を確認する（行がなければメモリ層の値を使う）
+                    # 計測はどちらの層が応答したかが決まってから1回だけ行う
+                    keyword_found[source] = (results, freshness)
+                    rechecks.add((keyword, source))
+                    continue
+                memory_cache.delete((keyword, source))
+            metrics.CACHE_REQUESTS.labels('memory', 'miss').inc()
+            missing.add((keyword, source))
+    
+    if missing or rechecks:
+        # 足りない組を含むキーワード・ソースで1回だけ問い合わせ、該当する組のみ使う
+        lookups = missing | rechecks
+        caches = await SearchCache.aget_caches_with_freshness_many({keyword for keyword, _ in lookups},
+                                                                   {source for _, source in lookups})
+        answered = set()
+        for keyword, source_caches in caches.items():
+            for source, (cache, freshness) in source_caches.items():
+                if (keyword, source) in lookups:
+                    metrics.CACHE_REQUESTS.labels('db', _CACHE_RESULTS[freshness]).inc()
+                    found[keyword][source] = (remember(cache), freshness)
+                    answered.add((keyword, source))
+        if missing - answered:
+            metrics.CACHE_REQUESTS.labels('db', 'miss').inc(len(missing - answered))
+        if rechecks - answered:
+            # データベース層に行がなく、メモリ層の期限切れの値をそのまま返す
+            metrics.CACHE_REQUESTS.labels('memory', 'stale').inc(len(rechecks - answered))
+    
+    return found
@@ -0,0 +1,104 @@
+"""
+検索結果のコンパクトな保存形式
+キャッシュする結果リストを列毎の配列に変換し（項目名は1回だけ保持）、
+ソース名・商品状態のように繰り返し現れる値は値表と番号で表したうえでzlibで圧縮する。
+列毎に保持するため、デコード時は行毎の辞書を作らずに列から直接 ProductResult を生成できる。
+
+形式: MAGIC + zlib(JSON [件数, 項目名, 列, 値表, 欠損])
+    列: 項目名と同じ順の値の配列（値表のある項目は値表の番号）
+    値表: 項目名 -> 重複を除いた値の配列
+    欠損: 項目名 -> その項目を持たない行の番号（全行が同じ項目を持つ場合は空）
+"""
+import json
+import zlib
+from itertools import repeat
+from typing import Any, Dict, List, Union
+
+from .scrapers.result import DEFAULTS, FIELDS, ProductResult
+
+# 形式の識別子（形式を変える場合はバージョンを上げる）
+MAGIC = b'CR1:'
+
+# 値表で表す項目
+INTERNED_FIELDS = ('source', 'condition')
+
+# 圧縮レベル（エンコードは保存時のみのため、デコード速度に影響しない範囲で高めにする）
+COMPRESSION_LEVEL = 6
+
+
+def encode_results(results: List[Union[ProductResult, Dict[str, Any]]]) -> bytes:
+    """
+    検索結果リストを保存形式に変換
+    
+    Args:
+        results (List[Union[ProductResult, Dict[str, Any]]]): 検索結果リスト
+    
+    Returns:
+        bytes: 圧縮済みのデータ
+    """
+    keys: Dict[str, None] = {}
+    for result in results:
+        keys.update(dict.fromkeys(result))
+    keys = list(keys)
+    
+    columns = []
+    tables = {}
+    absent = {}
+    for key in keys:
+        column = [result.get(key) for result in results]
+        missing = [index for index, result in enumerate(results) if key not in result]
+        if missing:
+            absent[key] = missing
+        if key in INTERNED_FIELDS:
+            numbers: Dict[Any, int] = {}
+            column = [numbers.setdefault(value, len(numbers)) for value in column]
+            tables[key] = list(numbers)
+        columns.append(column)
+    
+    payload = json.dumps([len(results), keys, columns, tables, absent], ensure_ascii=False, separators=(',', ':'))
+    return MAGIC + zlib.compress(payload.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def decode_results(data: bytes) -> List[Union[ProductResult, Dict[str, Any]]]:
+    """
+    保存形式から検索結果リストを復元
+    
+    Args:
+        data (bytes): encode_results で変換したデータ
+    
+    Returns:
+        List[Union[ProductResult, Dict[str, Any]]]: 検索結果リスト
+            （商品の項目以外を含む場合は辞書のリスト）
+    
+    Raises:
+        ValueError: 形式が不正な場合
+    """
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        raise ValueError('Unknown cached results format')
+    try:
+        count, keys, columns, tables, absent = json.loads(zlib.decompress(data[len(MAGIC):]))
+    except zlib.error as e:
+        raise ValueError(f'Corrupt cached results: {e}') from e
+    
+    if not keys:
+        return [{} for _ in range(count)]
+    for position, key in enumerate(keys):
+        table = tables.get(key)
+        if table is not None:
+            columns[position] = [table[number] for number in columns[position]]
+    
+    if DEFAULTS.keys() >= set(keys):
+        # 商品の項目のみの場合は ProductResult として復元する（ない項目は既定値）
+        for key, indexes in absent.items():
+            column, default = columns[keys.index(key)], DEFAULTS[key]
+            for index in indexes:
+                column[index] = default
+        by_key = dict(zip(keys, columns))
+        return list(map(ProductResult, *(by_key.get(field, repeat(DEFAULTS[field])) for field in FIELDS)))
+    
+    results = [dict(zip(keys, row)) for row in zip(*columns)]
+    for key, indexes in absent.items():
+        for index in indexes:
+            del results[index][key]
+    return results
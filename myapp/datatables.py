@@ -0,0 +1,214 @@
+"""
+検索結果テーブルのサーバーサイド処理（DataTables の server-side processing 形式）
+キーワード毎にマージ済みの検索結果を並び順の索引付きで保持し、
+絞り込み・並べ替え・ページ分割をサーバー側で行って1ページ分の行だけを返す。
+プロトコル: https://datatables.net/manual/server-side
+"""
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .cache import LRUCache
+from .scrapers.result import ProductResult, by_price
+
+# 並べ替え可能な列（列名 -> 並べ替えキー）。同値の場合は価格・取得順で並べる
+SORT_KEYS = {
+    'price': by_price,
+    'title': lambda result: (result.title or '').casefold(),
+    'source': attrgetter('source'),
+}
+DEFAULT_SORT = 'price'
+
+# 1ページの最大件数（length=-1 の「全件」指定もこの件数で打ち切る）
+MAX_PAGE_LENGTH = 500
+
+# settings.SEARCH_TABLE_CACHE で上書き可能なデフォルト値
+DEFAULT_TABLE_CACHE_CONFIG = {
+    'MAX_ENTRIES': 64,  # 保持するキーワード数
+    'TTL': 60,          # 保持時間（秒）
+}
+
+
+class ResultTable:
+    """1キーワード分のマージ済み検索結果と並び順の索引"""
+    
+    def __init__(self, results_dict: Dict[str, List[ProductResult]], meta: Optional[Dict[str, Any]] = None):
+        """
+        初期化（価格順の索引はここで作り、他の列の索引は初回の並べ替え時に作る）
+        
+        Args:
+            results_dict (Dict[str, List[ProductResult]]): サイト名をキーとした検索結果辞書
+            meta (Dict[str, Any], optional): 検索時の情報（search_all_sites の meta。鮮度・締め切り超過のサイト）
+        """
+        self.sources = dict(results_dict)
+        self.meta = dict(meta or {})
+        self.rows = [result for site_results in results_dict.values() for result in site_results]
+        self._orders: Dict[Tuple[str, bool], List[int]] = {}
+        price_order = self.order(DEFAULT_SORT)
+        # 価格順に並べた価格（価格範囲を二分探索で絞り込むため）
+        self._sorted_prices = [self.rows[index].price for index in price_order]
+    
+    def is_built_from(self, results_dict: Dict[str, List[ProductResult]]) -> bool:
+        """
+        同じ検索結果リストから作られたかどうか
+        キャッシュの結果リストは更新時に別オブジェクトに置き換わるため、同一性で判定する
+        """
+        return (self.sources.keys() == results_dict.keys()
+                and all(self.sources[source] is results for source, results in results_dict.items()))
+    
+    def order(self, column: str, descending: bool = False) -> List[int]:
+        """
+        列の順に並べた行番号のリストを取得（列・向き毎に1回だけ並べ替える）
+        降順でも逆順にするのは列の値のみで、同値の行は価格・取得順の昇順のまま並べる
+        
+        Args:
+            column (str): SORT_KEYS の列名
+            descending (bool): 降順にするかどうか
+        
+        Returns:
+            List[int]: 行番号のリスト
+        """
+        order = self._orders.get((column, descending))
+        if order is None:
+            key = SORT_KEYS[column]
+            rows = self.rows
+            if descending:
+                # 昇順の索引を列の値だけで安定ソートし直し、同値の行の順序を保つ
+                order = sorted(self.order(column), key=lambda index: key(rows[index]), reverse=True)
+            else:
+                price = SORT_KEYS[DEFAULT_SORT]
+                order = sorted(range(len(rows)), key=lambda index: (key(rows[index]), price(rows[index]), index))
+            self._orders[(column, descending)] = order
+        return order
+    
+    def iter_rows(self, sort: str = DEFAULT_SORT, descending: bool = False) -> Iterator[ProductResult]:
+        """
+        全行を列の順に返す（行はコピーしない）
+        
+        Args:
+            sort (str): 並べ替える列名（SORT_KEYS）
+            descending (bool): 降順にするかどうか
+        
+        Yields:
+            ProductResult: 検索結果の行
+        """
+        for index in self.order(sort, descending):
+            yield self.rows[index]
+    
+    def query(self, start: int = 0, length: int = 10, sort: str = DEFAULT_SORT, descending: bool = False,
+              min_price: Optional[int] = None, max_price: Optional[int] = None,
+              conditions: Sequence[str] = (), sources: Sequence[str] = (), search: str = '') -> Dict[str, Any]:
+        """
+        絞り込み・並べ替えを行い1ページ分の行を取得
+        
+        Args:
+            start (int): 先頭からのオフセット
+            length (int): 件数
+            sort (str): 並べ替える列名（SORT_KEYS）
+            descending (bool): 降順にするかどうか
+            min_price (int, optional): 価格の下限（以上）
+            max_price (int, optional): 価格の上限（以下）
+            conditions (Sequence[str]): 商品状態（いずれかに一致）
+            sources (Sequence[str]): サイト名（いずれかに一致）
+            search (str): 商品名に含まれる文字列（大文字小文字を区別しない）
+        
+        Returns:
+            Dict[str, Any]: 全件数 'total'・絞り込み後の件数 'filtered'・該当ページの行 'rows'
+        """
+        rows = self.rows
+        order = self.order(sort, descending)
+        if sort == DEFAULT_SORT:
+            # 価格順の場合は価格範囲を二分探索で切り出す（降順の索引では位置が反転する）
+            lo = 0 if min_price is None else bisect_left(self._sorted_prices, min_price)
+            hi = len(order) if max_price is None else bisect_right(self._sorted_prices, max_price)
+            candidates = order[len(order) - hi:len(order) - lo] if descending else order[lo:hi]
+        else:
+            candidates = order
+            if min_price is not None or max_price is not None:
+                price = SORT_KEYS[DEFAULT_SORT]
+                low = float('-inf') if min_price is None else min_price
+                high = float('inf') if max_price is None else max_price
+                candidates = [index for index in candidates if low <= price(rows[index]) <= high]
+        
+        if conditions or sources or search:
+            conditions, sources, search = set(conditions), set(sources), search.casefold()
+            candidates = [
+                index for index in candidates
+                if (not conditions or rows[index].condition in conditions)
+                and (not sources or rows[index].source in sources)
+                and (not search or search in (rows[index].title or '').casefold())
+            ]
+        
+        return {
+            'total': len(rows),
+            'filtered': len(candidates),
+            'rows': [rows[index] for index in candidates[start:start + length]],
+        }
+
+
+def _create_table_cache() -> LRUCache:
+    config = dict(DEFAULT_TABLE_CACHE_CONFIG)
+    config.update(getattr(settings, 'SEARCH_TABLE_CACHE', {}))
+    return LRUCache(max_entries=config['MAX_ENTRIES'], ttl=config['TTL'])
+
+
+# キーワードの正規形 -> ResultTable
+table_cache = _create_table_cache()
+
+
+def get_result_table(cache_key: str, results_dict: Dict[str, List[ProductResult]],
+                     meta: Optional[Dict[str, Any]] = None) -> ResultTable:
+    """
+    検索結果のテーブルを取得（同じキャッシュ結果から作ったテーブルがあれば再利用する）
+    
+    Args:
+        cache_key (str): キーワードの正規形
+        results_dict (Dict[str, List[ProductResult]]): サイト名をキーとした検索結果辞書
+        meta (Dict[str, Any], optional): 検索時の情報（指定時は再利用するテーブルの情報も更新する）
+    
+    Returns:
+        ResultTable: テーブル
+    """
+    table = table_cache.get(cache_key)
+    if table is None or not table.is_built_from(results_dict):
+        table = ResultTable(results_dict, meta)
+        table_cache.set(cache_key, table)
+    elif meta is not None:
+        table.meta = dict(meta)
+    return table
+
+
+def parse_request(params) -> Dict[str, Any]:
+    """
+    DataTables のリクエストパラメータを ResultTable.query の引数に変換
+    並べ替えは order[0] の列（columns[i][data] の列名）のみ使用する。
+    独自パラメータとして min_price・max_price・condition・source（複数指定可）を受け付ける
+    
+    Args:
+        params (QueryDict): リクエストパラメータ
+    
+    Returns:
+        Dict[str, Any]: ResultTable.query のキーワード引数
+    """
+    length = _parse_int(params.get('length'), 10)
+    column = params.get(f"columns[{_parse_int(params.get('order[0][column]'), -1)}][data]")
+    return {
+        'start': max(_parse_int(params.get('start'), 0), 0),
+        'length': MAX_PAGE_LENGTH if length < 0 else min(length, MAX_PAGE_LENGTH),
+        'sort': column if column in SORT_KEYS else DEFAULT_SORT,
+        'descending': params.get('order[0][dir]') == 'desc',
+        'min_price': _parse_int(params.get('min_price')),
+        'max_price': _parse_int(params.get('max_price')),
+        'conditions': [value for value in params.getlist('condition') if value],
+        'sources': [value for value in params.getlist('source') if value],
+        'search': params.get('search[value]', '').strip(),
+    }
+
+
+def _parse_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
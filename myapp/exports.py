@@ -0,0 +1,177 @@
+"""
+検索結果のエクスポート（CSV / JSON Lines / Parquet）
+行を1件ずつ書き出し、一定行数毎にチャンクとして返すジェネレータで生成する。
+出力全体をメモリに組み立てないため、件数によらずメモリ使用量は一定に保たれる
+"""
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+CSV = 'csv'
+JSONL = 'jsonl'
+PARQUET = 'parquet'
+
+# エクスポートする項目（出力順）
+EXPORT_FIELDS = ['title', 'price', 'condition', 'source', 'product_url', 'image_url']
+
+# 形式 -> (Content-Type, 拡張子)
+EXPORT_FORMATS = {
+    CSV: ('text/csv; charset=utf-8', 'csv'),
+    JSONL: ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    PARQUET: ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# 1チャンク（Parquetでは1行グループ）に含める行数
+CHUNK_ROWS = 500
+
+
+class _Buffer:
+    """書き込まれたデータを溜め、チャンク毎に取り出すための書き込み先"""
+    
+    def __init__(self):
+        self.parts: List[Any] = []
+    
+    def write(self, data):
+        self.parts.append(data)
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def drain(self):
+        """溜まったデータを連結して取り出す"""
+        data = self.parts[0][:0].join(self.parts) if self.parts else ''
+        self.parts.clear()
+        return data
+
+
+class _BinaryBuffer(io.RawIOBase):
+    """
+    バイナリの書き込み先（pyarrow の書き込み先として使う）
+    pyarrow はファイルオブジェクトとして closed・tell 等も参照するため io.RawIOBase を継承する
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.parts: List[bytes] = []
+        self.position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def drain(self) -> bytes:
+        """溜まったデータを連結して取り出す"""
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def is_available(export_format: str) -> bool:
+    """形式の依存パッケージがインストールされているかどうか"""
+    if export_format == PARQUET:
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return False
+    return export_format in EXPORT_FORMATS
+
+
+def iter_export(export_format: str, rows: Iterable[Dict[str, Any]]) -> Iterator:
+    """
+    検索結果を指定形式で書き出すジェネレータを取得
+    
+    Args:
+        export_format (str): 形式（CSV / JSONL / PARQUET）
+        rows (Iterable[Dict[str, Any]]): 検索結果
+    
+    Returns:
+        Iterator: 出力のチャンク（CSV・JSON Linesは str、Parquetは bytes）
+    """
+    writers = {CSV: iter_csv, JSONL: iter_jsonl, PARQUET: iter_parquet}
+    return writers[export_format](rows)
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    検索結果をCSVとして書き出す（1行目はヘッダー）
+    
+    Args:
+        rows (Iterable[Dict[str, Any]]): 検索結果
+    
+    Yields:
+        str: CSVのチャンク
+    """
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([row.get(field, '') for field in EXPORT_FIELDS])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def iter_jsonl(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """
+    検索結果をJSON Lines（1行1件のJSON）として書き出す
+    
+    Args:
+        rows (Iterable[Dict[str, Any]]): 検索結果
+    
+    Yields:
+        str: JSON Linesのチャンク
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({field: row.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False) + '\n')
+        if len(lines) == CHUNK_ROWS:
+            yield ''.join(lines)
+            lines.clear()
+    if lines:
+        yield ''.join(lines)
+
+
+def iter_parquet(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    検索結果をParquetとして書き出す（CHUNK_ROWS 件毎に1行グループ、pyarrowが必要）
+    
+    Args:
+        rows (Iterable[Dict[str, Any]]): 検索結果
+    
+    Yields:
+        bytes: Parquetファイルのチャンク
+    """
+    import pyarrow
+    import pyarrow.parquet
+    
+    schema = pyarrow.schema([(field, pyarrow.int64() if field == 'price' else pyarrow.string())
+                             for field in EXPORT_FIELDS])
+    buffer = _BinaryBuffer()
+    columns = {field: [] for field in EXPORT_FIELDS}
+    
+    with pyarrow.parquet.ParquetWriter(buffer, schema) as writer:
+        for count, row in enumerate(rows, 1):
+            for field, values in columns.items():
+                values.append(row.get(field))
+            if count % CHUNK_ROWS == 0:
+                writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+                for values in columns.values():
+                    values.clear()
+                yield buffer.drain()
+        if columns['title']:
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+    # フッターはクローズ時に書き込まれる
+    yield buffer.drain()
@@ -0,0 +1,52 @@
+"""
+検索キーワードの正規化
+"""
+import unicodedata
+
+# 語順を入れ替えると意味が変わる可能性がある検索演算子
+_ORDER_SENSITIVE_CHARS = ('"', "'", '(', ')')
+_ORDER_SENSITIVE_PREFIXES = ('-',)
+_ORDER_SENSITIVE_TOKENS = ('or', 'and', 'not')
+
+
+def normalize_keyword(keyword: str) -> str:
+    """
+    検索キーワードを正規化
+    NFKC正規化（全角英数・全角空白の半角化）・前後の空白除去・
+    連続空白の圧縮・大文字小文字の統一を行う。サイトへの検索クエリにはこの形を使う
+    
+    Args:
+        keyword (str): 入力されたキーワード
+        
+    Returns:
+        str: 正規化済みキーワード (例: "ＥＯＳ　Ｒ５ " -> "eos r5")
+    """
+    return ' '.join(unicodedata.normalize('NFKC', keyword).split()).casefold()
+
+
+def canonicalize_keyword(keyword: str) -> str:
+    """
+    キャッシュキー用の正規形を生成
+    正規化に加え、語順が結果に影響しない場合は語を並べ替える
+    
+    Args:
+        keyword (str): 入力されたキーワード
+        
+    Returns:
+        str: 正規形 (例: "R5 EOS" -> "eos r5")
+    """
+    normalized = normalize_keyword(keyword)
+    tokens = normalized.split(' ')
+    if _is_order_insensitive(normalized, tokens):
+        tokens.sort()
+    return ' '.join(tokens)
+
+
+def _is_order_insensitive(normalized: str, tokens: list) -> bool:
+    """引用符・括弧・除外指定・論理演算子を含まない単純なAND検索かどうか"""
+    if any(char in normalized for char in _ORDER_SENSITIVE_CHARS):
+        return False
+    return not any(
+        token.startswith(_ORDER_SENSITIVE_PREFIXES) or token in _ORDER_SENSITIVE_TOKENS
+        for token in tokens
+    )
@@ -0,0 +1,55 @@
+"""
+人気キーワードの検索キャッシュを事前取得するコマンド
+
+    python manage.py prewarm_search_cache --top 50 --budget 300
+    python manage.py prewarm_search_cache --loop   # 常駐して INTERVAL 秒毎に実行
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from myapp.prewarm import get_prewarm_config, prewarm
+from myapp.scrapers import executor, session
+
+
+class Command(BaseCommand):
+    help = '検索回数の多いキーワードの検索キャッシュを有効期限切れ前に再取得する'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, help='対象とする人気キーワード数')
+        parser.add_argument('--window-days', type=int, help='この日数以内に検索されたキーワードのみ対象')
+        parser.add_argument('--lead', type=int, help='有効期限までの残りがこの秒数以下のキャッシュを再取得')
+        parser.add_argument('--budget', type=int, help='1回の実行で取得するページ数の上限')
+        parser.add_argument('--concurrency', type=int, help='同時に再取得する検索数')
+        parser.add_argument('--loop', action='store_true', help='常駐して一定間隔で実行する')
+        parser.add_argument('--interval', type=int, help='常駐時の実行間隔（秒）')
+    
+    def handle(self, *args, **options):
+        config = get_prewarm_config(
+            TOP_N=options['top'],
+            WINDOW_DAYS=options['window_days'],
+            LEAD=options['lead'],
+            BUDGET=options['budget'],
+            CONCURRENCY=options['concurrency'],
+            INTERVAL=options['interval'],
+        )
+        try:
+            asyncio.run(self.run(config, options['loop']))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.shutdown_executor()
+    
+    async def run(self, config, loop):
+        try:
+            while True:
+                stats = await prewarm(config)
+                self.stdout.write(
+                    f"{stats['keywords']} keywords, {stats['refreshed']} site caches refreshed, "
+                    f"budget used {stats['budget_used']}/{config['BUDGET']}, skipped {stats['skipped']}"
+                )
+                if not loop:
+                    break
+                await asyncio.sleep(config['INTERVAL'])
+        finally:
+            await session.close_session()
@@ -0,0 +1,190 @@
+"""
+検索パイプラインの計測（Prometheus形式）
+カウンタ・ヒストグラムをプロセス内に保持し、/metrics でテキスト形式で出力する。
+記録はラベル値毎の子オブジェクトへの加算のみで、ホットパスでも使えるよう軽量にしている
+（プロセス毎の値のため、複数ワーカー構成ではワーカー毎に収集される）。
+"""
+import bisect
+import threading
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 秒単位のレイテンシ用の既定バケット
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry: List['Metric'] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """メトリクスの基底クラス（ラベル値の組毎に子オブジェクトを持つ）"""
+    
+    type_name = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), register: bool = True):
+        """
+        初期化
+        
+        Args:
+            name (str): メトリクス名
+            documentation (str): 説明（HELP行）
+            labelnames (Iterable[str]): ラベル名
+            register (bool): /metrics の出力対象に登録するかどうか
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if register:
+            _registry.append(self)
+    
+    def labels(self, *values):
+        """ラベル値に対応する子オブジェクトを取得（初回のみ生成）"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def collect(self) -> List[str]:
+        """テキスト形式の行を生成"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items(), key=lambda item: item[0]):
+            lines.extend(self._child_lines(tuple(str(value) for value in values), child))
+        return lines
+    
+    def _child_lines(self, values, child) -> List[str]:
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        """記録した値を全て破棄（テスト用）"""
+        with self._lock:
+            self._children.clear()
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    """単調増加するカウンタ（名前は慣例に従い _total で終える）"""
+    
+    type_name = 'counter'
+    
+    def _new_child(self):
+        return _CounterChild()
+    
+    def inc(self, amount: float = 1) -> None:
+        """ラベルなしのカウンタに加算"""
+        self.labels().inc(amount)
+    
+    def _child_lines(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(Metric):
+    """値の分布（バケット毎の累積件数・合計・件数）"""
+    
+    type_name = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, register: bool = True):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, register)
+    
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+    
+    def observe(self, value: float) -> None:
+        """ラベルなしのヒストグラムに記録"""
+        self.labels().observe(value)
+    
+    def _child_lines(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+def render() -> str:
+    """登録済みの全メトリクスをテキスト形式で出力"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+# 取得（HTTP）
+FETCH_SECONDS = Histogram('scraper_fetch_seconds', 'Store page fetch latency per attempt', ['source'])
+FETCH_RESPONSES = Counter('scraper_fetch_responses_total', 'Store page fetch attempts by status (or timeout/error)',
+                          ['source', 'status'])
+FETCH_RETRIES = Counter('scraper_fetch_retries_total', 'Store page fetch retries', ['source'])
+FETCH_BYTES = Counter('scraper_fetch_bytes_total', 'Bytes of store pages received', ['source'])
+
+# パース・抽出
+PARSE_SECONDS = Histogram('scraper_parse_seconds', 'Page parse and extract time including executor hand-off',
+                          ['source'])
+ITEMS_PER_PAGE = Histogram('scraper_items_per_page', 'Items extracted per result page', ['source'],
+                           buckets=(0, 1, 5, 10, 20, 50, 100, 200))
+
+# キャッシュ
+CACHE_REQUESTS = Counter('search_cache_requests_total', 'Search cache lookups by tier and result (hit/stale/miss)',
+                         ['tier', 'result'])
+
+# 検索全体
+SEARCH_SECONDS = Histogram('search_seconds', 'End-to-end search latency across all sites')
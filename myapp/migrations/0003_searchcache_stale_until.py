@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_searchcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchcache',
+            name='stale_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='再検証期限'),
+        ),
+    ]
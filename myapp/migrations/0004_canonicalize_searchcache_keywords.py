@@ -0,0 +1,50 @@
+import unicodedata
+
+from django.db import migrations
+
+# このマイグレーション作成時点の myapp.keywords.canonicalize_keyword の複製
+# （アプリのコードが変わってもマイグレーションの結果が変わらないように固定する）
+_ORDER_SENSITIVE_CHARS = ('"', "'", '(', ')')
+_ORDER_SENSITIVE_PREFIXES = ('-',)
+_ORDER_SENSITIVE_TOKENS = ('or', 'and', 'not')
+
+
+def canonicalize_keyword(keyword):
+    """キャッシュキー用の正規形を生成"""
+    normalized = ' '.join(unicodedata.normalize('NFKC', keyword).split()).casefold()
+    tokens = normalized.split(' ')
+    if not any(char in normalized for char in _ORDER_SENSITIVE_CHARS) and not any(
+        token.startswith(_ORDER_SENSITIVE_PREFIXES) or token in _ORDER_SENSITIVE_TOKENS
+        for token in tokens
+    ):
+        tokens.sort()
+    return ' '.join(tokens)
+
+
+def canonicalize_keywords(apps, schema_editor):
+    """
+    既存キャッシュのキーワードを正規形に変換
+    正規形が重複する行は有効期限が最も新しいものだけを残す
+    """
+    SearchCache = apps.get_model('myapp', 'SearchCache')
+    kept = {}
+    for cache in SearchCache.objects.order_by('-expires_at', '-id').iterator():
+        key = (canonicalize_keyword(cache.keyword)[:100], cache.source)
+        if key in kept:
+            cache.delete()
+            continue
+        kept[key] = cache.pk
+        if cache.keyword != key[0]:
+            cache.keyword = key[0]
+            cache.save(update_fields=['keyword'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_searchcache_stale_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_keywords, migrations.RunPython.noop),
+    ]
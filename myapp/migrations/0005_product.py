@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 17:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def add_title_fulltext_index(apps, schema_editor):
+    """商品名のFULLTEXTインデックス（日本語向けにn-gramパーサー）を作成（MySQLのみ）"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE myapp_product ADD FULLTEXT INDEX myapp_product_title_ft (title) WITH PARSER ngram'
+    )
+
+
+def remove_title_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE myapp_product DROP INDEX myapp_product_title_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_canonicalize_searchcache_keywords'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_url', models.CharField(max_length=500, unique=True, verbose_name='商品URL')),
+                ('title', models.CharField(max_length=500, verbose_name='商品名')),
+                ('price', models.IntegerField(db_index=True, default=0, verbose_name='価格')),
+                ('condition', models.CharField(blank=True, db_index=True, max_length=50, verbose_name='コンディション')),
+                ('image_url', models.CharField(blank=True, max_length=500, verbose_name='画像URL')),
+                ('source', models.CharField(max_length=50, verbose_name='ソースサイト')),
+                ('first_seen_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='初回取得日時')),
+                ('last_seen_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最終取得日時')),
+            ],
+            options={
+                'verbose_name': '商品',
+                'verbose_name_plural': '商品',
+                'indexes': [models.Index(fields=['source', 'last_seen_at'], name='myapp_produ_source_80cf74_idx')],
+            },
+        ),
+        migrations.RunPython(add_title_fulltext_index, remove_title_fulltext_index),
+    ]
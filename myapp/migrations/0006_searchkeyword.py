@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 17:36
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True, verbose_name='検索キーワード')),
+                ('search_count', models.PositiveIntegerField(default=0, verbose_name='検索回数')),
+                ('first_searched_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='初回検索日時')),
+                ('last_searched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最終検索日時')),
+            ],
+            options={
+                'verbose_name': '検索キーワード',
+                'verbose_name_plural': '検索キーワード',
+            },
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2 on 2026-10-18 17:42
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+# このマイグレーション作成時点の myapp.codec の形式（CR1）のエンコード・デコードの複製
+# （アプリのコードが変わってもマイグレーションの結果が変わらないように固定する。結果は辞書で扱う）
+MAGIC = b'CR1:'
+INTERNED_FIELDS = ('source', 'condition')
+
+
+def encode_results(results):
+    """検索結果（辞書）のリストをコンパクト形式に変換"""
+    keys = {}
+    for result in results:
+        keys.update(dict.fromkeys(result))
+    keys = list(keys)
+    
+    columns = []
+    tables = {}
+    absent = {}
+    for key in keys:
+        column = [result.get(key) for result in results]
+        missing = [index for index, result in enumerate(results) if key not in result]
+        if missing:
+            absent[key] = missing
+        if key in INTERNED_FIELDS:
+            numbers = {}
+            column = [numbers.setdefault(value, len(numbers)) for value in column]
+            tables[key] = list(numbers)
+        columns.append(column)
+    
+    payload = json.dumps([len(results), keys, columns, tables, absent], ensure_ascii=False, separators=(',', ':'))
+    return MAGIC + zlib.compress(payload.encode('utf-8'), 6)
+
+
+def decode_results(data):
+    """コンパクト形式から検索結果（辞書）のリストを復元"""
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        raise ValueError('Unknown cached results format')
+    try:
+        count, keys, columns, tables, absent = json.loads(zlib.decompress(data[len(MAGIC):]))
+    except zlib.error as e:
+        raise ValueError(f'Corrupt cached results: {e}') from e
+    
+    if not keys:
+        return [{} for _ in range(count)]
+    for position, key in enumerate(keys):
+        table = tables.get(key)
+        if table is not None:
+            columns[position] = [table[number] for number in columns[position]]
+    results = [dict(zip(keys, row)) for row in zip(*columns)]
+    for key, indexes in absent.items():
+        for index in indexes:
+            del results[index][key]
+    return results
+
+
+def compact_results(apps, schema_editor):
+    """既存キャッシュの結果をJSONからコンパクト形式に変換"""
+    SearchCache = apps.get_model('myapp', 'SearchCache')
+    for cache in SearchCache.objects.filter(results_data__isnull=True).iterator():
+        results = cache.results_json
+        if isinstance(results, str):
+            try:
+                results = json.loads(results)
+            except ValueError:
+                results = []
+        cache.results_data = encode_results(results or [])
+        cache.results_json = None
+        cache.save(update_fields=['results_data', 'results_json'])
+
+
+def expand_results(apps, schema_editor):
+    """コンパクト形式の結果をJSONに戻す"""
+    SearchCache = apps.get_model('myapp', 'SearchCache')
+    for cache in SearchCache.objects.filter(results_data__isnull=False).iterator():
+        try:
+            cache.results_json = decode_results(cache.results_data)
+        except ValueError:
+            cache.results_json = []
+        cache.save(update_fields=['results_json'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_searchkeyword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchcache',
+            name='results_data',
+            field=models.BinaryField(null=True, verbose_name='検索結果（圧縮）'),
+        ),
+        migrations.AlterField(
+            model_name='searchcache',
+            name='results_json',
+            field=models.JSONField(blank=True, null=True, verbose_name='検索結果JSON'),
+        ),
+        migrations.RunPython(compact_results, expand_results),
+    ]
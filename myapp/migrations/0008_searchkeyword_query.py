@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_searchcache_compact_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchkeyword',
+            name='query',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='検索クエリ'),
+        ),
+    ]
@@ -1,8 +1,14 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 from datetime import timedelta
 import json
 
+from .codec import decode_results, encode_results
+from .scrapers.result import ProductResult, as_results
+
 class Category(models.Model):
     name = models.CharField('カテゴリ名', max_length=50)
     created_at = models.DateTimeField('作成日', default=timezone.now)
@@ -39,11 +45,18 @@ class Task(models.Model):
 
 class SearchCache(models.Model):
     """検索結果をキャッシュするモデル"""
+    FRESH = 'fresh'      # 有効期限内
+    STALE = 'stale'      # 有効期限切れだが再検証期限内（表示しつつ裏で更新）
+    EXPIRED = 'expired'  # 再検証期限切れ
+    
     keyword = models.CharField('検索キーワード', max_length=100)
     source = models.CharField('ソースサイト', max_length=50)  # サイト名
-    results_json = models.JSONField('検索結果JSON')  # 検索結果をJSON形式で保存
+    # 旧形式（JSON）。新しい行は results_data にコンパクト形式で保存し、こちらはNULLにする
+    results_json = models.JSONField('検索結果JSON', null=True, blank=True)
+    results_data = models.BinaryField('検索結果（圧縮）', null=True, editable=False)  # codec.encode_results の形式
     created_at = models.DateTimeField('作成日時', auto_now_add=True)
     expires_at = models.DateTimeField('有効期限')
+    stale_until = models.DateTimeField('再検証期限', blank=True, null=True)
     
     def __str__(self):
         return f"{self.keyword} - {self.source}"
@@ -53,43 +66,161 @@ class SearchCache(models.Model):
         """キャッシュが期限切れかどうか"""
         return timezone.now() > self.expires_at
     
+    @property
+    def freshness(self):
+        """キャッシュの鮮度（FRESH / STALE / EXPIRED）"""
+        return self.compute_freshness(self.expires_at, self.stale_until)
+    
+    @classmethod
+    def compute_freshness(cls, expires_at, stale_until):
+        """有効期限・再検証期限から鮮度を判定"""
+        now = timezone.now()
+        if now <= expires_at:
+            return cls.FRESH
+        if stale_until and now <= stale_until:
+            return cls.STALE
+        return cls.EXPIRED
+    
     @property
     def results(self):
-        """JSONから結果リストを取得"""
+        """保存形式（旧形式のJSONを含む）から結果リストを取得（デコードはインスタンス毎に1回）"""
+        decoded = getattr(self, '_decoded_results', None)
+        if decoded is None:
+            decoded = self._decoded_results = self.decode_results()
+        return decoded
+    
+    def decode_results(self):
+        """保存されている結果リストをデコード"""
         try:
-            if isinstance(self.results_json, str):
-                return json.loads(self.results_json)
-            return self.results_json
-        except (json.JSONDecodeError, TypeError):
+            if self.results_data is not None:
+                return decode_results(self.results_data)
+            results = self.results_json
+            if isinstance(results, str):
+                results = json.loads(results)
+            return [ProductResult.from_dict(result) for result in results or []]
+        except (ValueError, TypeError, AttributeError):
             return []
     
+    @staticmethod
+    def get_ttl(source):
+        """
+        ソース毎のキャッシュ有効期間を取得
+        settings.SEARCH_CACHE_TTL のソース別設定、なければ 'default' を使用
+        
+        Returns:
+            tuple: (ソフトTTL, ハードTTL) のtimedelta
+        """
+        ttl_settings = getattr(settings, 'SEARCH_CACHE_TTL', {})
+        ttl = ttl_settings.get(source) or ttl_settings.get('default', {})
+        soft = ttl.get('SOFT', 3600)
+        hard = max(ttl.get('HARD', soft), soft)
+        return timedelta(seconds=soft), timedelta(seconds=hard)
+    
+    @staticmethod
+    def get_partial_ttl(source):
+        """
+        締め切りで打ち切られた部分結果のキャッシュ有効期間を取得
+        settings.SEARCH_CACHE_TTL の 'PARTIAL'（ソース別設定、なければ 'default'）を使用
+        
+        Returns:
+            timedelta: 有効期間
+        """
+        ttl_settings = getattr(settings, 'SEARCH_CACHE_TTL', {})
+        ttl = ttl_settings.get(source) or ttl_settings.get('default', {})
+        return timedelta(seconds=ttl.get('PARTIAL', 5 * 60))
+    
     @classmethod
-    def create_cache(cls, keyword, source, results, cache_duration=timedelta(hours=1)):
-        """キャッシュを作成"""
-        expires_at = timezone.now() + cache_duration
+    def create_cache(cls, keyword, source, results, cache_duration=None):
+        """
+        キャッシュを作成
+        
+        cache_duration 未指定時はソース毎のソフトTTLを有効期限、
+        ハードTTLを再検証期限とする。
+        cache_duration 指定時（部分結果）は有効期限・再検証期限ともその期間とし、
+        期限後は期限切れのまま返さずに再取得させる
+        """
+        results = as_results(results)
+        soft_ttl, hard_ttl = cls.get_ttl(source)
+        if cache_duration is not None:
+            soft_ttl = hard_ttl = cache_duration
+        now = timezone.now()
         
         # 既存のキャッシュがあれば更新
         cache, created = cls.objects.update_or_create(
             keyword=keyword,
             source=source,
             defaults={
-                'results_json': results,
-                'expires_at': expires_at
+                'results_json': None,
+                'results_data': encode_results(results),
+                'expires_at': now + soft_ttl,
+                'stale_until': now + hard_ttl,
             }
         )
+        # 保存した結果リストをそのまま使う（直後のデコードを省く）
+        cache._decoded_results = results
         return cache
     
     @classmethod
-    def get_valid_cache(cls, keyword, source):
-        """有効なキャッシュを取得"""
+    def get_cache_with_freshness(cls, keyword, source):
+        """
+        再検証期限内のキャッシュを鮮度付きで取得
+        再検証期限を過ぎたキャッシュは削除する
+        
+        Returns:
+            tuple: (キャッシュ, 鮮度)、該当なしの場合は (None, None)
+        """
         try:
             cache = cls.objects.get(keyword=keyword, source=source)
-            if cache.is_expired:
-                cache.delete()
-                return None
-            return cache
         except cls.DoesNotExist:
+            return None, None
+        freshness = cache.freshness
+        if freshness == cls.EXPIRED:
+            cache.delete()
+            return None, None
+        return cache, freshness
+    
+    @classmethod
+    async def aget_caches_with_freshness(cls, keyword, sources):
+        """
+        複数ソースのキャッシュを1回のクエリでまとめて取得（非同期ORM）
+        再検証期限切れのキャッシュは含めない（再取得時に上書きされる）
+        
+        Args:
+            keyword (str): 検索キーワード
+            sources (Iterable[str]): ソース名
+            
+        Returns:
+            dict: ソース名をキーとした (キャッシュ, 鮮度) の辞書
+        """
+        return (await cls.aget_caches_with_freshness_many([keyword], sources)).get(keyword, {})
+    
+    @classmethod
+    async def aget_caches_with_freshness_many(cls, keywords, sources):
+        """
+        複数キーワード・複数ソースのキャッシュを1回のクエリでまとめて取得（非同期ORM）
+        再検証期限切れのキャッシュは含めない（再取得時に上書きされる）
+        
+        Args:
+            keywords (Iterable[str]): 検索キーワード
+            sources (Iterable[str]): ソース名
+            
+        Returns:
+            dict: キーワード -> ソース名 -> (キャッシュ, 鮮度) の辞書（キャッシュがないキーワードは含まない）
+        """
+        caches = {}
+        async for cache in cls.objects.filter(keyword__in=list(keywords), source__in=list(sources)):
+            freshness = cache.freshness
+            if freshness != cls.EXPIRED:
+                caches.setdefault(cache.keyword, {})[cache.source] = (cache, freshness)
+        return caches
+    
+    @classmethod
+    def get_valid_cache(cls, keyword, source):
+        """有効なキャッシュを取得"""
+        cache, freshness = cls.get_cache_with_freshness(keyword, source)
+        if freshness != cls.FRESH:
             return None
+        return cache
     
     class Meta:
         verbose_name = '検索キャッシュ'
@@ -97,3 +228,199 @@ class SearchCache(models.Model):
         indexes = [
             models.Index(fields=['keyword', 'source']),
         ]
+
+
+class Product(models.Model):
+    """
+    スクレイピングで取得した商品の索引（商品URL毎に1行）
+    検索の度に upsert_results で最新の内容に更新し、ローカル検索に使う
+    """
+    # MySQLのFULLTEXTインデックス名（マイグレーション 0005 で作成）
+    FULLTEXT_INDEX = 'myapp_product_title_ft'
+    
+    # ローカル検索の最大件数
+    SEARCH_LIMIT = 200
+    
+    product_url = models.CharField('商品URL', max_length=500, unique=True)
+    title = models.CharField('商品名', max_length=500)
+    price = models.IntegerField('価格', default=0, db_index=True)
+    condition = models.CharField('コンディション', max_length=50, blank=True, db_index=True)
+    image_url = models.CharField('画像URL', max_length=500, blank=True)
+    source = models.CharField('ソースサイト', max_length=50)
+    first_seen_at = models.DateTimeField('初回取得日時', default=timezone.now)
+    last_seen_at = models.DateTimeField('最終取得日時', default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.title} ({self.source})"
+    
+    def to_result(self):
+        """検索結果と同じ形式（ProductResult）に変換"""
+        return ProductResult(self.title, self.price, self.condition, self.image_url, self.product_url, self.source)
+    
+    @classmethod
+    def from_result(cls, result, source, seen_at):
+        """検索結果（ProductResult または辞書）からインスタンスを生成（商品URLがない場合はNone）"""
+        product_url = result.get('product_url') or ''
+        if not product_url or len(product_url) > 500:
+            return None
+        return cls(
+            product_url=product_url,
+            title=(result.get('title') or '')[:500],
+            price=result.get('price') or 0,
+            condition=(result.get('condition') or '')[:50],
+            image_url=(result.get('image_url') or '')[:500],
+            source=source,
+            first_seen_at=seen_at,
+            last_seen_at=seen_at,
+        )
+    
+    @classmethod
+    def upsert_kwargs(cls):
+        """
+        bulk_create で既存行を更新するための引数
+        MySQLは ON DUPLICATE KEY UPDATE のため一意キーを指定しない
+        """
+        kwargs = {
+            'update_conflicts': True,
+            'update_fields': ['title', 'price', 'condition', 'image_url', 'source', 'last_seen_at'],
+        }
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs['unique_fields'] = ['product_url']
+        return kwargs
+    
+    @classmethod
+    async def aupsert_results(cls, source, results):
+        """
+        検索結果を商品索引に一括登録・更新（非同期ORM）
+        
+        Args:
+            source (str): ソース名
+            results (list): 検索結果リスト
+            
+        Returns:
+            int: 登録・更新した件数
+        """
+        seen_at = timezone.now()
+        products = {}
+        for result in results:
+            product = cls.from_result(result, source, seen_at)
+            if product is not None:
+                # 同じ商品URLが1回の一括登録に複数含まれるとMySQL以外で失敗するため後勝ちにする
+                products[product.product_url] = product
+        if not products:
+            return 0
+        await cls.objects.abulk_create(products.values(), batch_size=500, **cls.upsert_kwargs())
+        return len(products)
+    
+    @classmethod
+    def search_queryset(cls, keyword, sources=None):
+        """
+        商品名でのローカル検索
+        MySQLではn-gramパーサーのFULLTEXTインデックスで全語を含む商品を関連度順に、
+        それ以外のデータベースでは部分一致で最終取得日時の新しい順に返す
+        
+        Args:
+            keyword (str): 正規化済みの検索キーワード（空白区切りの語は全て含む）
+            sources (Iterable[str], optional): 対象のソース名
+            
+        Returns:
+            QuerySet: 検索結果
+        """
+        terms = keyword.split()
+        queryset = cls.objects.all()
+        if sources is not None:
+            queryset = queryset.filter(source__in=list(sources))
+        if not terms:
+            return queryset.none()
+        
+        if connection.vendor != 'mysql':
+            for term in terms:
+                queryset = queryset.filter(title__icontains=term)
+            return queryset.order_by('-last_seen_at')
+        
+        # n-gram（既定2文字）より短い語はFULLTEXTで引けないため部分一致で絞り込む
+        ngram_terms = [term for term in terms if len(term) >= 2]
+        for term in terms:
+            if len(term) < 2:
+                queryset = queryset.filter(title__icontains=term)
+        if not ngram_terms:
+            return queryset.order_by('-last_seen_at')
+        query = ' '.join('+"{}"'.format(term.replace('"', '')) for term in ngram_terms)
+        return queryset.annotate(
+            relevance=RawSQL('MATCH (title) AGAINST (%s IN BOOLEAN MODE)', (query,)),
+        ).filter(relevance__gt=0).order_by('-relevance', '-last_seen_at')
+    
+    @classmethod
+    async def asearch(cls, keyword, sources=None, limit=None):
+        """
+        商品名でのローカル検索（非同期ORM）
+        
+        Returns:
+            list: ProductResult のリスト
+        """
+        queryset = cls.search_queryset(keyword, sources)[:limit or cls.SEARCH_LIMIT]
+        return [product.to_result() async for product in queryset]
+    
+    class Meta:
+        verbose_name = '商品'
+        verbose_name_plural = '商品'
+        indexes = [
+            models.Index(fields=['source', 'last_seen_at']),
+        ]
+
+
+class SearchKeyword(models.Model):
+    """検索キーワード（正規形）毎の検索回数。人気キーワードの事前取得に使う"""
+    keyword = models.CharField('検索キーワード', max_length=100, unique=True)
+    # 利用者が入力したキーワードの正規化済みの形（直近の検索のもの）。事前取得時のサイトへの検索クエリに使う
+    query = models.CharField('検索クエリ', max_length=100, blank=True, default='')
+    search_count = models.PositiveIntegerField('検索回数', default=0)
+    first_searched_at = models.DateTimeField('初回検索日時', default=timezone.now)
+    last_searched_at = models.DateTimeField('最終検索日時', default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{self.keyword} ({self.search_count})"
+    
+    @classmethod
+    def record(cls, keyword, query=''):
+        """
+        検索回数を1増やす（未登録のキーワードは登録する）
+        
+        Args:
+            keyword (str): 正規形の検索キーワード
+            query (str, optional): サイトへの検索クエリ（正規化済みキーワード）。未指定時は正規形を使う
+        """
+        keyword = keyword[:100]
+        query = (query or keyword)[:100]
+        now = timezone.now()
+        updates = {'search_count': F('search_count') + 1, 'last_searched_at': now, 'query': query}
+        if cls.objects.filter(keyword=keyword).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(keyword=keyword, query=query, search_count=1, first_searched_at=now,
+                                   last_searched_at=now)
+        except IntegrityError:
+            # 同時に登録された場合
+            cls.objects.filter(keyword=keyword).update(**updates)
+    
+    @classmethod
+    def popular(cls, limit, since=None):
+        """
+        検索回数の多いキーワードを取得
+        
+        Args:
+            limit (int): 最大件数
+            since (datetime, optional): この日時以降に検索されたキーワードのみ
+            
+        Returns:
+            QuerySet: 検索回数の多い順
+        """
+        queryset = cls.objects.all()
+        if since is not None:
+            queryset = queryset.filter(last_searched_at__gte=since)
+        return queryset.order_by('-search_count', '-last_searched_at')[:limit]
+    
+    class Meta:
+        verbose_name = '検索キーワード'
+        verbose_name_plural = '検索キーワード'
@@ -0,0 +1,104 @@
+"""
+人気キーワードの検索キャッシュの事前取得
+検索回数の多いキーワードについて、期限切れが近い（または未取得の）サイトのキャッシュを
+期限切れ前に再取得し、利用者の検索がキャッシュから返るようにする。
+サイトへのリクエストは検索時と同じホスト単位のレート制限に従い、1回の実行で取得するページ数は
+クロール予算（BUDGET）を超えない。
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SearchCache, SearchKeyword
+from .utils import get_all_scrapers, refresh_site_cache
+
+logger = logging.getLogger(__name__)
+
+# settings.SEARCH_PREWARM で上書き可能なデフォルト値
+DEFAULT_PREWARM_CONFIG = {
+    'TOP_N': 50,         # 対象とする人気キーワード数
+    'WINDOW_DAYS': 7,    # この日数以内に検索されたキーワードのみ対象
+    'LEAD': 600,         # 有効期限までの残りがこの秒数以下のキャッシュを再取得する
+    'BUDGET': 300,       # 1回の実行で取得するページ数の上限（クロール予算）
+    'CONCURRENCY': 2,    # 同時に再取得する検索数
+    'INTERVAL': 300,     # 常駐時の実行間隔（秒）
+}
+
+
+def get_prewarm_config(**overrides) -> Dict[str, Any]:
+    """
+    事前取得の設定を取得
+
+    Args:
+        **overrides: 個別に上書きする値（Noneは無視）
+
+    Returns:
+        Dict[str, Any]: デフォルト値に settings とoverridesの値をマージした設定
+    """
+    config = dict(DEFAULT_PREWARM_CONFIG)
+    config.update(getattr(settings, 'SEARCH_PREWARM', {}))
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+async def prewarm(config: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    人気キーワードのキャッシュを1回事前取得
+
+    Args:
+        config (Dict[str, Any], optional): 設定（未指定時は get_prewarm_config()）
+
+    Returns:
+        Dict[str, int]: 対象キーワード数・再取得したサイト数・予算切れで見送ったサイト数・使用した予算
+    """
+    config = config or get_prewarm_config()
+    since = timezone.now() - timedelta(days=config['WINDOW_DAYS'])
+    # キャッシュキー（正規形）と、サイトへの検索クエリ（利用者が入力した形。未記録の場合は正規形）
+    keywords = [(row.keyword, row.query or row.keyword)
+                async for row in SearchKeyword.popular(config['TOP_N'], since)]
+
+    budget = config['BUDGET']
+    refresh_before = timezone.now() + timedelta(seconds=config['LEAD'])
+    semaphore = asyncio.Semaphore(config['CONCURRENCY'])
+    stats = {'keywords': len(keywords), 'refreshed': 0, 'skipped': 0, 'budget_used': 0}
+
+    async def refresh(scraper, query, keyword):
+        async with semaphore:
+            # 利用者の検索と同じ相乗り・締め切り・キャッシュ保存の経路で取得する
+            results = await refresh_site_cache(scraper, query, keyword)
+        if results:
+            stats['refreshed'] += 1
+
+    tasks = []
+    # 人気順に予算を割り当てる
+    for keyword, query in keywords:
+        scrapers = get_all_scrapers()
+        caches = await SearchCache.aget_caches_with_freshness(keyword, [scraper.name for scraper in scrapers])
+        for scraper in scrapers:
+            cache = caches.get(scraper.name, (None, None))[0]
+            if cache is not None and cache.expires_at > refresh_before:
+                continue
+            # 1サイトの検索で取得し得る最大ページ数を予算から差し引く
+            cost = scraper.get_max_pages()
+            if cost > budget:
+                stats['skipped'] += 1
+                continue
+            budget -= cost
+            stats['budget_used'] += cost
+            tasks.append(asyncio.ensure_future(refresh(scraper, query, keyword)))
+
+    try:
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Prewarm refresh failed: {result!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    logger.info(f"Prewarmed {stats['refreshed']} site caches for {stats['keywords']} keywords "
+                f"(budget used {stats['budget_used']}, skipped {stats['skipped']})")
+    return stats
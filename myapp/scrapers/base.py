@@ -3,12 +3,22 @@
 全てのサイトスクレイパーの基底クラス
 """
 import logging
-import aiohttp
 import asyncio
+import time
 import traceback
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from django.conf import settings
+
+from .. import metrics
+from .executor import run_in_parse_executor
+from .httpcache import FetchResult, HttpCacheEntry, body_digest, get_http_cache
+from .parsers import parse_document, resolve_backend
+from .ratelimit import get_bucket
+from .result import ProductResult
+from .session import get_session
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +29,34 @@ class BaseScraperException(Exception):
 class BaseScraper(ABC):
     """スクレイパーの基底クラス"""
     
+    # HTMLパーサーバックエンド（Noneの場合は settings.SCRAPER_PARSER_BACKEND）
+    parser_backend: Optional[str] = None
+    
+    # 商品一覧を囲む要素のセレクタ。指定時はこの部分木（とページ送り）のみをパースする
+    product_container_selector: Optional[str] = None
+    
+    # 2ページ目以降へのリンクのセレクタ（Noneの場合は1ページ目のみ取得）
+    pagination_selector: Optional[str] = None
+    
+    # 取得する最大ページ数（Noneの場合は settings.SCRAPER_MAX_PAGES）
+    max_pages: Optional[int] = None
+    
+    # 2ページ目以降を同時に取得するページ数の上限
+    page_concurrency: int = 2
+    
     def __init__(self, delay_seconds: float = 1.0):
         """
         初期化
         
         Args:
-            delay_seconds (float): リクエスト間の待機時間（秒）
+            delay_seconds (float): 同一ホストへのリクエスト間隔（秒）。
+                settings.SCRAPER_RATE_LIMIT でRATEが未指定の場合のレート制限に使用
         """
         self.delay = delay_seconds
         self.name = self.__class__.__name__
+        # マージ済みの結果（締め切りで打ち切られた場合の部分結果として使用）
+        self.partial_results: List[ProductResult] = []
+        self.parser_backend = resolve_backend(self.parser_backend)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
@@ -38,19 +67,198 @@ class BaseScraper(ABC):
             'Upgrade-Insecure-Requests': '1',
         }
     
-    @abstractmethod
-    async def search(self, keyword: str) -> List[Dict[str, Any]]:
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        pickle用の状態（パース用エグゼキュータへ extract を送る際に使用）
+        部分結果やインスタンスに差し込まれた関数は送らない
+        """
+        return {
+            key: value for key, value in self.__dict__.items()
+            if key != 'partial_results' and not callable(value)
+        }
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.partial_results = []
+    
+    async def search(self, keyword: str) -> List[ProductResult]:
         """
         キーワードで検索を実行
+        全ページの結果を取得順にマージし、商品URLで重複を除く。
+        マージ済みの結果は partial_results からも随時参照できる
+        
+        Args:
+            keyword (str): 検索キーワード
+            
+        Returns:
+            List[ProductResult]: 検索結果リスト
+        """
+        self.partial_results = results = []
+        seen_urls = set()
+        
+        async for page_items in self.search_pages(keyword):
+            for item in self.format_result(page_items):
+                product_url = item.product_url
+                if product_url:
+                    if product_url in seen_urls:
+                        continue
+                    seen_urls.add(product_url)
+                results.append(item)
+        
+        return results
+    
+    async def search_pages(self, keyword: str) -> AsyncIterator[List[ProductResult]]:
+        """
+        検索結果をページ単位で取得
+        1ページ目を最初に返し、ページ送りから見つけた2ページ目以降は
+        page_concurrency 件ずつ並行して取得し、届いた順に返す
+        
+        Args:
+            keyword (str): 検索キーワード
+            
+        Yields:
+            List[ProductResult]: ページ毎の商品情報リスト（整形前）
+        """
+        search_url = self.build_search_url(keyword)
+        logger.debug(f"Scraping {self.name} with keyword: {keyword} URL: {search_url}")
+        
+        page = await self.fetch_page(search_url)
+        if page is None:
+            logger.warning(f"Failed to get HTML from {self.name}")
+            return
+        
+        items, page_urls = page
+        yield items
+        
+        page_urls = [url for url in page_urls if url != search_url][:self.get_max_pages() - 1]
+        if not page_urls:
+            return
+        
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        
+        async def fetch_other_page(url):
+            async with semaphore:
+                page = await self.fetch_page(url)
+            return page[0] if page is not None else []
+        
+        tasks = [asyncio.ensure_future(fetch_other_page(url)) for url in page_urls]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def fetch_page(self, url: str) -> Optional[Tuple[List[ProductResult], List[str]]]:
+        """
+        検索結果ページを取得して商品情報と他ページのURLを抽出
+        前回の取得時から変わっていない（304 または本文が同一の）場合は前回の抽出結果を再利用する
+        
+        Args:
+            url (str): 検索結果ページのURL
+            
+        Returns:
+            Optional[Tuple[List[ProductResult], List[str]]]: extract の結果、取得エラー時はNone
+        """
+        http_cache = get_http_cache()
+        cache_key = (self.name, url)
+        entry: Optional[HttpCacheEntry] = http_cache.get(cache_key)
+        
+        result = await self.fetch(url, entry.conditional_headers() if entry else None)
+        if result is None:
+            return None
+        
+        if result.status == 304:
+            if entry is None:
+                logger.error(f"Unexpected 304 for {url} without cached page")
+                return None
+            logger.debug(f"{url} not modified. Reusing parsed results")
+            http_cache.set(cache_key, entry)
+            return entry.parsed
+        
+        digest = body_digest(result.html)
+        if entry is not None and entry.digest == digest:
+            logger.debug(f"{url} body unchanged. Reusing parsed results")
+            parsed = entry.parsed
+        else:
+            # パース・商品抽出はイベントループ外で実行
+            started = time.perf_counter()
+            parsed = await run_in_parse_executor(self.extract, result.html)
+            metrics.PARSE_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+            metrics.ITEMS_PER_PAGE.labels(self.name).observe(len(parsed[0]))
+        
+        http_cache.set(cache_key, HttpCacheEntry(result.etag, result.last_modified, digest, parsed))
+        return parsed
+    
+    def build_search_url(self, keyword: str) -> str:
+        """
+        検索結果1ページ目のURLを生成
         
         Args:
             keyword (str): 検索キーワード
             
         Returns:
-            List[Dict[str, Any]]: 検索結果リスト
+            str: 検索URL
+        """
+        return self.search_url_template.format(keyword=keyword.replace(" ", "+"))
+    
+    def get_max_pages(self) -> int:
+        """取得する最大ページ数"""
+        if self.max_pages is not None:
+            return max(self.max_pages, 1)
+        return max(getattr(settings, 'SCRAPER_MAX_PAGES', 1), 1)
+    
+    def extract(self, html: str) -> Tuple[List[ProductResult], List[str]]:
+        """
+        検索結果ページのHTMLから商品情報と他ページのURLを抽出
+        パース用エグゼキュータ（別プロセス）で実行されるため、インスタンスの状態は変更しない
+        
+        Args:
+            html (str): 検索結果ページのHTML
+            
+        Returns:
+            Tuple[List[ProductResult], List[str]]: (商品情報リスト（整形前）, 他ページのURLリスト)
+        """
+        soup = self.parse_html(html)
+        if not soup:
+            return [], []
+        return self.extract_items(soup), self.discover_page_urls(soup)
+    
+    @abstractmethod
+    def extract_items(self, soup) -> List[ProductResult]:
+        """
+        パース済みの検索結果ページから商品情報を抽出
+        
+        Args:
+            soup: parse_html の結果
+            
+        Returns:
+            List[ProductResult]: 商品情報リスト（整形前。format_result で変換できる辞書でもよい）
         """
         pass
     
+    def discover_page_urls(self, soup) -> List[str]:
+        """
+        ページ送りのリンクから2ページ目以降のURLを抽出（出現順・重複なし）
+        
+        Args:
+            soup: parse_html の結果
+            
+        Returns:
+            List[str]: 絶対URLのリスト
+        """
+        if not self.pagination_selector:
+            return []
+        page_urls = []
+        for link in soup.select(self.pagination_selector):
+            href = link.attrs.get('href')
+            if not href:
+                continue
+            url = urljoin(self.base_url, href)
+            if url not in page_urls:
+                page_urls.append(url)
+        return page_urls
+    
     async def get_html(self, url: str) -> Optional[str]:
         """
         指定URLからHTMLを取得
@@ -61,72 +269,108 @@ class BaseScraper(ABC):
         Returns:
             Optional[str]: HTML文字列、エラー時はNone
         """
+        result = await self.fetch(url)
+        return result.html if result is not None else None
+    
+    async def fetch(self, url: str, conditional_headers: Optional[Dict[str, str]] = None) -> Optional[FetchResult]:
+        """
+        指定URLを取得
+        
+        Args:
+            url (str): 取得対象URL
+            conditional_headers (Dict[str, str], optional): If-None-Match / If-Modified-Since ヘッダ
+            
+        Returns:
+            Optional[FetchResult]: 200（本文と検証子）または 304、エラー時はNone
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                for attempt in range(3):  # 最大再試行回数03回
-                    try:
-                        async with session.get(url, headers=self.headers, timeout=30) as response:
-                            if response.status == 200:
-                                html = await response.text()
-                                await asyncio.sleep(self.delay)  # サイトへの負荷軽減
-                                return html
-                            elif response.status == 429:  # Too Many Requests
-                                logger.warning(f"Rate limited on {url}. Waiting before retry...")
-                                await asyncio.sleep(self.delay * 2)  # 長めの待機時間
-                                continue
-                            else:
-                                logger.error(f"Error fetching {url}: Status {response.status}")
-                                return None
-                    except asyncio.TimeoutError:
-                        logger.warning(f"Timeout fetching {url}. Attempt {attempt+1}/3")
-                        await asyncio.sleep(self.delay)
-                    except Exception as e:
-                        logger.exception(f"Exception on attempt {attempt+1}/3 while fetching {url}: {e}")
-                        await asyncio.sleep(self.delay)
-                        
-                logger.error(f"Failed to fetch {url} after 3 attempts")
-                return None
+            # 共有セッションを使用し、接続・DNS解決を検索間で再利用する
+            session = await get_session()
         except Exception as e:
-            logger.exception(f"Exception while creating session for {url}: {e}")
+            logger.exception(f"Exception while getting session for {url}: {e}")
             return None
+        
+        headers = {**self.headers, **conditional_headers} if conditional_headers else self.headers
+        
+        # 同一ホストへの全検索で共有するレート制限（サイトへの負荷軽減）
+        bucket = get_bucket(url, self.delay)
+        
+        for attempt in range(3):  # 最大再試行回数03回
+            if attempt:
+                metrics.FETCH_RETRIES.labels(self.name).inc()
+            try:
+                if bucket is not None:
+                    await bucket.acquire()
+                started = time.perf_counter()
+                async with session.get(url, headers=headers, timeout=30) as response:
+                    if response.status == 200:
+                        body = await response.read()
+                        # 読み込み済みの本文をレスポンスの文字コードでデコード（本文を再度読まない）
+                        html = body.decode(response.get_encoding())
+                        metrics.FETCH_BYTES.labels(self.name).inc(len(body))
+                    metrics.FETCH_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+                    metrics.FETCH_RESPONSES.labels(self.name, str(response.status)).inc()
+                    
+                    if response.status == 200:
+                        return FetchResult(
+                            200, html, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                        )
+                    elif response.status == 304 and conditional_headers:  # Not Modified
+                        return FetchResult(304)
+                    elif response.status == 429:  # Too Many Requests
+                        logger.warning(f"Rate limited on {url}. Waiting before retry...")
+                        # 長めの待機時間（同一ホストへの他の検索も止める）
+                        if bucket is not None:
+                            bucket.penalize(self.delay * 2)
+                        else:
+                            await asyncio.sleep(self.delay * 2)
+                        continue
+                    else:
+                        logger.error(f"Error fetching {url}: Status {response.status}")
+                        return None
+            except asyncio.TimeoutError:
+                metrics.FETCH_RESPONSES.labels(self.name, 'timeout').inc()
+                logger.warning(f"Timeout fetching {url}. Attempt {attempt+1}/3")
+                await asyncio.sleep(self.delay)
+            except Exception as e:
+                metrics.FETCH_RESPONSES.labels(self.name, 'error').inc()
+                logger.exception(f"Exception on attempt {attempt+1}/3 while fetching {url}: {e}")
+                await asyncio.sleep(self.delay)
+                
+        logger.error(f"Failed to fetch {url} after 3 attempts")
+        return None
     
-    def parse_html(self, html: str) -> Optional[BeautifulSoup]:
+    def parse_html(self, html: str):
         """
-        HTML文字列をBeautifulSoupオブジェクトに変換
+        HTML文字列を設定されたパーサーバックエンドで解析
         
         Args:
             html (str): HTML文字列
             
         Returns:
-            Optional[BeautifulSoup]: パース結果、エラー時はNone
+            select / select_one を持つパース結果（BeautifulSoup等）、エラー時はNone
         """
         try:
-            return BeautifulSoup(html, 'html.parser')
+            only = tuple(selector for selector in (self.product_container_selector, self.pagination_selector) if selector)
+            return parse_document(html, self.parser_backend, only=only or None)
         except Exception as e:
             logger.exception(f"Error parsing HTML: {e}")
             return None
     
-    def format_result(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def format_result(self, items: List[Union[ProductResult, Dict[str, Any]]]) -> List[ProductResult]:
         """
-        スクレイピング結果を統一フォーマットに変換
+        スクレイピング結果を統一フォーマット（ProductResult）に変換
+        このスクレイパーのソース名を持つ ProductResult はコピーせずにそのまま使う
         
         Args:
-            items (List[Dict[str, Any]]): スクレイピング結果
+            items (List[Union[ProductResult, Dict[str, Any]]]): スクレイピング結果
             
         Returns:
-            List[Dict[str, Any]]: フォーマット済み結果
-        """
-        formatted_items = []
-        
-        for item in items:
-            formatted_item = {
-                'title': item.get('title', ''),
-                'price': item.get('price', 0),
-                'condition': item.get('condition', ''),
-                'image_url': item.get('image_url', ''),
-                'product_url': item.get('product_url', ''),
-                'source': self.name,
-            }
-            formatted_items.append(formatted_item)
-        
-        return formatted_items
+            List[ProductResult]: フォーマット済み結果
+        """
+        name = self.name
+        return [
+            item if isinstance(item, ProductResult) and item.source == name
+            else ProductResult.from_dict(item, name)
+            for item in items
+        ]
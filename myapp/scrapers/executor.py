@@ -0,0 +1,118 @@
+"""
+パース処理用エグゼキュータ
+CPU負荷の高いHTMLパース・商品抽出をイベントループ外（プロセスプール）で実行する
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROCESS = 'process'  # プロセスプール（複数コアで並列にパース）
+THREAD = 'thread'    # スレッドプール（ループは塞がないがGILで直列化される）
+INLINE = 'inline'    # イベントループ上で直接実行（従来の動作）
+
+# settings.SCRAPER_PARSE_EXECUTOR で上書き可能なデフォルト値
+DEFAULT_EXECUTOR_CONFIG = {
+    'KIND': PROCESS,
+    'MAX_WORKERS': None,       # Noneの場合はCPUコア数
+    'START_METHOD': 'spawn',   # スレッドを持つプロセスからのforkを避ける
+}
+
+_executor: Optional[Executor] = None
+_initialized = False
+_lock = threading.Lock()
+
+
+def get_executor_config() -> Dict[str, Any]:
+    """
+    エグゼキュータ設定を取得
+    
+    Returns:
+        Dict[str, Any]: デフォルト値にsettingsの値をマージした設定
+    """
+    config = dict(DEFAULT_EXECUTOR_CONFIG)
+    config.update(getattr(settings, 'SCRAPER_PARSE_EXECUTOR', {}))
+    return config
+
+
+def _create_executor(kind: str, max_workers: Optional[int], start_method: str) -> Optional[Executor]:
+    """
+    エグゼキュータを生成
+    プロセスプールを生成できない環境ではスレッドプールにフォールバックする
+    """
+    if kind == INLINE:
+        return None
+    if kind == PROCESS:
+        try:
+            context = multiprocessing.get_context(start_method)
+            return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        except (ImportError, NotImplementedError, OSError, ValueError) as e:
+            logger.warning(f"Process pool is not available ({e}). Falling back to thread pool")
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scraper-parse')
+
+
+def get_executor() -> Optional[Executor]:
+    """
+    共有エグゼキュータを取得（初回呼び出し時に生成）
+    
+    Returns:
+        Optional[Executor]: エグゼキュータ、INLINE設定の場合はNone
+    """
+    global _executor, _initialized
+    with _lock:
+        if not _initialized:
+            config = get_executor_config()
+            _executor = _create_executor(config['KIND'], config['MAX_WORKERS'], config['START_METHOD'])
+            _initialized = True
+        return _executor
+
+
+def _fall_back_to_threads() -> None:
+    """プロセスプールが異常終了した場合にスレッドプールへ切り替える"""
+    global _executor
+    with _lock:
+        if isinstance(_executor, ProcessPoolExecutor):
+            logger.error("Parse process pool is broken. Falling back to thread pool")
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = _create_executor(THREAD, get_executor_config()['MAX_WORKERS'], None)
+
+
+async def run_in_parse_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    パース処理をエグゼキュータで実行
+    プロセスプールの場合、funcと引数はpickle可能である必要がある
+    
+    Args:
+        func (Callable): 実行する関数（スクレイパーの extract 等）
+        *args: 関数に渡す引数
+        
+    Returns:
+        Any: 関数の戻り値
+    """
+    executor = get_executor()
+    if executor is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, partial(func, *args))
+    except BrokenProcessPool:
+        _fall_back_to_threads()
+        return await loop.run_in_executor(get_executor(), partial(func, *args))
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """終了時フック: エグゼキュータを停止（次回の get_executor で設定から再生成される）"""
+    global _executor, _initialized
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+        _initialized = False
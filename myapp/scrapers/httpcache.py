@@ -0,0 +1,70 @@
+"""
+検索結果ページのHTTPキャッシュ
+ETag / Last-Modified による条件付きGETと本文のダイジェストで、
+ページが変わっていない場合は前回の抽出結果をパースし直さずに再利用する
+"""
+import hashlib
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+# settings.SCRAPER_HTTP_CACHE で上書き可能なデフォルト値
+DEFAULT_HTTP_CACHE_CONFIG = {
+    'MAX_ENTRIES': 512,  # 保持する最大ページ数
+    'TTL': 86400,        # エントリの保持時間（秒）
+}
+
+# プロセス内のキャッシュ（初回使用時に生成）
+_http_cache = None
+_lock = threading.Lock()
+
+
+class FetchResult(NamedTuple):
+    """HTTPレスポンスのうちキャッシュ判定に使う部分"""
+    status: int
+    html: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class HttpCacheEntry(NamedTuple):
+    """ページ毎のキャッシュエントリ"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    # extract の結果（商品情報リスト, 他ページのURLリスト）
+    parsed: Tuple[List[Dict[str, Any]], List[str]]
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """条件付きGET用のリクエストヘッダ"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def body_digest(html: str) -> str:
+    """本文のダイジェスト（検証子を返さないサイトでも未変更を判定するため）"""
+    return hashlib.blake2b(html.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+def get_http_cache():
+    """
+    プロセス内のHTTPキャッシュを取得
+    パース用ワーカープロセスでは使わないため、アプリ側のモジュールは初回使用時に読み込む
+
+    Returns:
+        myapp.cache.LRUCache: キー (スクレイパー名, URL)、値 HttpCacheEntry のキャッシュ
+    """
+    global _http_cache
+    with _lock:
+        if _http_cache is None:
+            from ..cache import LRUCache
+
+            config = dict(DEFAULT_HTTP_CACHE_CONFIG)
+            config.update(getattr(settings, 'SCRAPER_HTTP_CACHE', {}))
+            _http_cache = LRUCache(config['MAX_ENTRIES'], config['TTL'])
+        return _http_cache
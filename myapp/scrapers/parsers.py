@@ -0,0 +1,240 @@
+"""
+HTMLパーサーバックエンド
+スクレイパーが使う select / select_one 形式のインターフェースで、
+BeautifulSoup（html.parser / lxml）と selectolax を切り替えて使えるようにする
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HTML_PARSER = 'html.parser'  # 標準ライブラリ（追加依存なし、最も遅い）
+LXML = 'lxml'                # BeautifulSoup + lxml ビルダー
+SELECTOLAX = 'selectolax'    # selectolax（lexborエンジン）
+
+PARSER_BACKENDS = (HTML_PARSER, LXML, SELECTOLAX)
+
+DEFAULT_PARSER_BACKEND = HTML_PARSER
+
+# SoupStrainer に変換できる単純セレクタ（例: "div.product-list", ".used_list", "#items"）
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[a-zA-Z][\w-]*)?(?P<rest>(?:[.#][\w-]+)*)$')
+
+
+def _is_available(backend: str) -> bool:
+    """バックエンドの依存パッケージがインストールされているかどうか"""
+    try:
+        if backend == LXML:
+            import lxml  # noqa: F401
+        elif backend == SELECTOLAX:
+            import selectolax.lexbor  # noqa: F401
+    except ImportError:
+        return False
+    return backend in PARSER_BACKENDS
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """
+    使用するパーサーバックエンドを決定
+    未指定時は settings.SCRAPER_PARSER_BACKEND を使用し、
+    依存パッケージがない場合は html.parser にフォールバックする
+    
+    Args:
+        backend (str, optional): バックエンド名
+        
+    Returns:
+        str: 利用可能なバックエンド名
+    """
+    backend = backend or getattr(settings, 'SCRAPER_PARSER_BACKEND', DEFAULT_PARSER_BACKEND)
+    if backend == HTML_PARSER or _is_available(backend):
+        return backend
+    logger.warning(f"HTML parser backend '{backend}' is not available. Falling back to '{HTML_PARSER}'")
+    return HTML_PARSER
+
+
+class SelectolaxNode:
+    """selectolaxのノードをBeautifulSoupのタグと同じ形で扱うラッパー"""
+    
+    __slots__ = ('_node',)
+    
+    def __init__(self, node):
+        self._node = node
+    
+    def select(self, selector: str) -> List['SelectolaxNode']:
+        return [SelectolaxNode(node) for node in self._node.css(selector)]
+    
+    def select_one(self, selector: str) -> Optional['SelectolaxNode']:
+        node = self._node.css_first(selector)
+        return SelectolaxNode(node) if node is not None else None
+    
+    @property
+    def text(self) -> str:
+        return self._node.text()
+    
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        return self._node.text(separator=separator, strip=strip)
+    
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        return {key: value if value is not None else '' for key, value in self._node.attributes.items()}
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.attrs.get(key, default)
+    
+    def __getitem__(self, key: str) -> Any:
+        return self.attrs[key]
+
+
+def _compound_spec(selector: str) -> Optional[Tuple[Optional[str], Optional[str], Tuple[str, ...]]]:
+    """
+    セレクタの先頭の複合セレクタを (タグ名, ID, クラス) に変換
+    子孫・子結合子を含む場合は先頭部分の部分木に全て含まれるため、先頭部分のみを見る
+    
+    Args:
+        selector (str): CSSセレクタ
+        
+    Returns:
+        Optional[Tuple]: 変換できない（兄弟結合子・複数セレクタ・属性セレクタを含む）場合はNone
+    """
+    if any(combinator in selector for combinator in ('+', '~', ',')):
+        return None
+    parts = selector.replace('>', ' ').split()
+    if not parts:
+        return None
+    return _parse_compound(parts[0])
+
+
+def _parse_compound(part: str) -> Optional[Tuple[Optional[str], Optional[str], Tuple[str, ...]]]:
+    """単純な複合セレクタ（例: "a.item-link", "#items"）を (タグ名, ID, クラス) に変換"""
+    match = _SIMPLE_SELECTOR.match(part)
+    if not match or not (match.group('tag') or match.group('rest')):
+        return None
+    ids = re.findall(r'#([\w-]+)', match.group('rest'))
+    classes = tuple(re.findall(r'\.([\w-]+)', match.group('rest')))
+    return match.group('tag'), ids[0] if ids else None, classes
+
+
+def _descendant_chain(selector: str) -> Optional[tuple]:
+    """
+    子孫結合子のみからなるセレクタ（例: ".item-image img"）を複合セレクタの列に変換
+    
+    Returns:
+        Optional[tuple]: 変換できない場合はNone
+    """
+    if any(char in selector for char in '+~,>[:*'):
+        return None
+    chain = tuple(_parse_compound(part) for part in selector.split())
+    if not chain or None in chain:
+        return None
+    return chain
+
+
+def _matches_spec(spec, name: str, attrs: Dict[str, Any]) -> bool:
+    """パース中の開始タグ（タグ名と属性）が複合セレクタに一致するかどうか"""
+    tag, id_, classes = spec
+    if tag and tag != name:
+        return False
+    if id_ and attrs.get('id') != id_:
+        return False
+    if classes:
+        value = attrs.get('class') or ''
+        tag_classes = set(value.split() if isinstance(value, str) else value)
+        if not set(classes) <= tag_classes:
+            return False
+    return True
+
+
+class CompiledSelector:
+    """
+    事前コンパイル済みのCSSセレクタ
+    BeautifulSoup系の文書では、子孫結合子のみの単純なセレクタはタグ名・ID・クラスの直接比較で照合し、
+    それ以外は soupsieve のコンパイル結果を使う。
+    selectolax の文書にはセレクタ文字列をそのまま渡す（lexbor側でコンパイルされる）
+    """
+    
+    __slots__ = ('selector', '_pattern', '_chain')
+    
+    def __init__(self, selector: str):
+        self.selector = selector
+        # 構文エラーはここで検出する
+        self._pattern = soupsieve.compile(selector)
+        self._chain = _descendant_chain(selector)
+    
+    def select(self, node) -> list:
+        if isinstance(node, SelectolaxNode):
+            return node.select(self.selector)
+        if self._chain is not None:
+            return node.find_all(self.match)
+        return self._pattern.select(node)
+    
+    def select_one(self, node):
+        if isinstance(node, SelectolaxNode):
+            return node.select_one(self.selector)
+        if self._chain is not None:
+            return node.find(self.match)
+        return self._pattern.select_one(node)
+    
+    def match(self, tag: Tag) -> bool:
+        """BeautifulSoupのタグがセレクタに一致するかどうか"""
+        chain = self._chain
+        if chain is None:
+            return self._pattern.match(tag)
+        if not _matches_spec(chain[-1], tag.name, tag.attrs):
+            return False
+        # 残りの複合セレクタを祖先要素に近い側から順に照合する
+        index = len(chain) - 2
+        parent = tag.parent
+        while index >= 0 and parent is not None:
+            if _matches_spec(chain[index], parent.name, parent.attrs):
+                index -= 1
+            parent = parent.parent
+        return index < 0
+    
+    def __repr__(self) -> str:
+        return f"CompiledSelector({self.selector!r})"
+
+
+@lru_cache(maxsize=64)
+def strainer_for(*selectors: str) -> Optional[SoupStrainer]:
+    """
+    セレクタ（の先頭の複合セレクタ）を SoupStrainer に変換
+    複数指定時はいずれかに一致する要素の部分木を残す
+    
+    Args:
+        *selectors (str): CSSセレクタ
+        
+    Returns:
+        Optional[SoupStrainer]: 1つでも変換できないセレクタがある場合はNone
+    """
+    specs = [_compound_spec(selector.strip()) for selector in selectors]
+    if not specs or None in specs:
+        return None
+    return SoupStrainer(lambda name, attrs: any(_matches_spec(spec, name, attrs) for spec in specs))
+
+
+def parse_document(html: str, backend: Optional[str] = None, only: Union[str, Sequence[str], None] = None):
+    """
+    HTML文字列を select / select_one で検索可能な文書に変換
+    
+    Args:
+        html (str): HTML文字列
+        backend (str, optional): パーサーバックエンド名（未指定時は設定値）
+        only (str | Sequence[str], optional): 指定時、これらのセレクタに一致する要素の部分木のみを構築する
+            （BeautifulSoup系バックエンドのみ。selectolaxは全体を構築しても十分速い）
+        
+    Returns:
+        BeautifulSoup または SelectolaxNode: パース結果
+    """
+    backend = resolve_backend(backend)
+    if backend == SELECTOLAX:
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxNode(LexborHTMLParser(html).root)
+    if isinstance(only, str):
+        only = (only,)
+    strainer = strainer_for(*only) if only else None
+    return BeautifulSoup(html, backend, parse_only=strainer)
@@ -0,0 +1,140 @@
+"""
+ホスト単位のリクエストレート制限
+同一ホストへの全ての同時検索で共有するトークンバケット
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# settings.SCRAPER_RATE_LIMIT で上書き可能なデフォルト値
+DEFAULT_RATE_LIMIT = {
+    'RATE': None,  # 1秒あたりのリクエスト数（Noneの場合はスクレイパーの delay から算出）
+    'BURST': 3,    # 待機なしで連続して送れるリクエスト数（バケット容量）
+}
+
+# ホスト毎のバケット（プロセス内の全スクレイパー・全検索で共有）
+_buckets: Dict[str, 'TokenBucket'] = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    トークンバケット
+    トークンがあれば待機なしで通し、なければ補充されるまで待機させる。
+    待機分はトークンを前借りして予約するため、同時に待つリクエストも rate の間隔で順に通る
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        初期化
+        
+        Args:
+            rate (float): 1秒あたりに補充されるトークン数
+            burst (int): バケット容量
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    def reserve(self) -> float:
+        """
+        トークンを1つ予約
+        
+        Returns:
+            float: 予約したトークンが使えるまでの待機時間（秒）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    def refund(self) -> None:
+        """使わなかった予約済みトークンを返却"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+    
+    def penalize(self, seconds: float) -> None:
+        """
+        一定時間リクエストを止める（429 Too Many Requests を受けた場合など）
+        
+        Args:
+            seconds (float): 停止する時間（秒）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+    
+    async def acquire(self) -> None:
+        """トークンを1つ取得（なければ補充されるまで待機）"""
+        wait = self.reserve()
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.refund()
+            raise
+
+
+def get_rate_limit_config(host: str) -> Dict[str, Any]:
+    """
+    ホストのレート制限設定を取得
+    
+    Args:
+        host (str): ホスト名
+    
+    Returns:
+        Dict[str, Any]: デフォルト値に settings の 'default' とホスト毎の値をマージした設定
+    """
+    overrides = getattr(settings, 'SCRAPER_RATE_LIMIT', {})
+    config = dict(DEFAULT_RATE_LIMIT)
+    config.update(overrides.get('default', {}))
+    config.update(overrides.get(host, {}))
+    return config
+
+
+def get_bucket(url: str, delay: float = 0) -> Optional[TokenBucket]:
+    """
+    URLのホストに対応する共有バケットを取得
+    
+    Args:
+        url (str): リクエスト先URL
+        delay (float): 設定でRATEが未指定の場合のリクエスト間隔（秒）
+    
+    Returns:
+        Optional[TokenBucket]: レート制限しない（RATE・delayとも未指定）場合はNone
+    """
+    host = urlsplit(url).netloc.lower()
+    bucket = _buckets.get(host)
+    if bucket is not None:
+        return bucket
+    
+    config = get_rate_limit_config(host)
+    rate = config['RATE'] or (1 / delay if delay > 0 else None)
+    if not rate:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(rate, config['BURST'])
+            logger.info(f"Rate limit for {host}: {rate:.2f} req/s (burst {bucket.burst})")
+    return bucket
+
+
+def reset_buckets() -> None:
+    """全ホストのバケットを破棄（設定変更時・テスト用）"""
+    with _buckets_lock:
+        _buckets.clear()
@@ -0,0 +1,124 @@
+"""
+検索結果の商品1件を表すレコード
+抽出からマージ・並べ替え・キャッシュまで同じオブジェクトを受け渡し、
+辞書（JSON）への変換は応答を返す境界でのみ行う。
+パース用ワーカープロセスでも使うため、Djangoに依存しないこと
+"""
+import json
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Union
+
+# 項目名（JSON・CSVの出力順）
+FIELDS = ('title', 'price', 'condition', 'image_url', 'product_url', 'source')
+
+# 項目の既定値（抽出できなかった項目）
+DEFAULTS = {'title': '', 'price': 0, 'condition': '', 'image_url': '', 'product_url': '', 'source': ''}
+
+# 価格での並べ替え用のキー
+by_price = attrgetter('price')
+
+
+class ProductResult(Mapping):
+    """
+    商品1件（__slots__ により辞書より小さく、生成も速い）
+    読み取りは辞書と同じ result['price'] / result.get('price') の形でも行える
+    """
+    
+    __slots__ = FIELDS
+    
+    def __init__(self, title: str = '', price: int = 0, condition: str = '', image_url: str = '',
+                 product_url: str = '', source: str = ''):
+        self.title = title
+        self.price = price
+        self.condition = condition
+        self.image_url = image_url
+        self.product_url = product_url
+        self.source = source
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Optional[str] = None) -> 'ProductResult':
+        """
+        辞書から生成（ない項目は既定値）
+        
+        Args:
+            data (Dict[str, Any]): 検索結果の辞書
+            source (str, optional): ソース名（指定時は辞書の値より優先）
+        
+        Returns:
+            ProductResult: レコード
+        """
+        return cls(
+            data.get('title', ''),
+            data.get('price', 0),
+            data.get('condition', ''),
+            data.get('image_url', ''),
+            data.get('product_url', ''),
+            source if source is not None else data.get('source', ''),
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """辞書に変換（JSON化用）"""
+        return {
+            'title': self.title,
+            'price': self.price,
+            'condition': self.condition,
+            'image_url': self.image_url,
+            'product_url': self.product_url,
+            'source': self.source,
+        }
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in DEFAULTS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in DEFAULTS else default
+    
+    def __iter__(self):
+        return iter(FIELDS)
+    
+    def __len__(self) -> int:
+        return len(FIELDS)
+    
+    def __contains__(self, key) -> bool:
+        return key in DEFAULTS
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ProductResult):
+            return all(getattr(self, field) == getattr(other, field) for field in FIELDS)
+        return super().__eq__(other)
+    
+    __hash__ = None
+    
+    def __reduce__(self):
+        # ワーカープロセスとの受け渡しでは値のタプルのみを送る
+        return (ProductResult, tuple(getattr(self, field) for field in FIELDS))
+    
+    def __repr__(self) -> str:
+        return f"ProductResult({self.source!r}, {self.title!r}, {self.price!r})"
+
+
+def as_results(items: List[Union['ProductResult', Dict[str, Any]]]) -> List['ProductResult']:
+    """
+    結果リストを ProductResult のリストに揃える（全件が ProductResult の場合はリストをそのまま返す）
+    
+    Args:
+        items (List[Union[ProductResult, Dict[str, Any]]]): 検索結果リスト
+    
+    Returns:
+        List[ProductResult]: 検索結果リスト
+    """
+    if all(isinstance(item, ProductResult) for item in items):
+        return items
+    return [item if isinstance(item, ProductResult) else ProductResult.from_dict(item) for item in items]
+
+
+class ResultJSONEncoder(json.JSONEncoder):
+    """ProductResult を辞書としてJSON化するエンコーダ"""
+    
+    def default(self, o):
+        if isinstance(o, ProductResult):
+            return o.to_dict()
+        return super().default(o)
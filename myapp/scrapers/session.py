@@ -0,0 +1,115 @@
+"""
+共有HTTPセッション管理
+全スクレイパーが共有する、プロセス単位の長寿命aiohttpセッション
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Optional
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# settings.SCRAPER_HTTP_SESSION で上書き可能なデフォルト値
+DEFAULT_SESSION_CONFIG = {
+    'LIMIT': 100,             # 全体の同時接続数上限
+    'LIMIT_PER_HOST': 4,      # ホスト毎の同時接続数上限
+    'DNS_CACHE_TTL': 300,     # DNSキャッシュの保持時間（秒）
+    'KEEPALIVE_TIMEOUT': 30,  # アイドル接続の保持時間（秒）
+}
+
+# イベントループ毎のセッション（aiohttpのセッションはループに束縛されるため）
+_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = weakref.WeakKeyDictionary()
+
+# ASGIのlifespanで起動したイベントループ（セッションは shutdown でクローズする）
+_lifespan_loops: 'weakref.WeakSet[asyncio.AbstractEventLoop]' = weakref.WeakSet()
+
+# lifespanのないイベントループ毎の、ループ終了時にセッションをクローズするタスク
+_closers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]' = weakref.WeakKeyDictionary()
+
+
+def get_session_config() -> Dict[str, Any]:
+    """
+    セッション設定を取得
+    
+    Returns:
+        Dict[str, Any]: デフォルト値にsettingsの値をマージした設定
+    """
+    config = dict(DEFAULT_SESSION_CONFIG)
+    config.update(getattr(settings, 'SCRAPER_HTTP_SESSION', {}))
+    return config
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """コネクタプール付きのセッションを生成"""
+    config = get_session_config()
+    connector = aiohttp.TCPConnector(
+        limit=config['LIMIT'],
+        limit_per_host=config['LIMIT_PER_HOST'],
+        use_dns_cache=True,
+        ttl_dns_cache=config['DNS_CACHE_TTL'],
+        keepalive_timeout=config['KEEPALIVE_TIMEOUT'],
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    現在のイベントループに対応する共有セッションを取得
+    
+    Returns:
+        aiohttp.ClientSession: 共有セッション（未作成・クローズ済みの場合は新規作成）
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _create_session()
+        _sessions[loop] = session
+        if loop not in _lifespan_loops and loop not in _closers:
+            # runserver・WSGI・管理コマンドではリクエスト・コマンド毎にループが作られるため、
+            # ループの終了時にクローズする（クローズしないとセッションと接続が残り続ける）
+            _closers[loop] = loop.create_task(_close_at_loop_exit())
+    return session
+
+
+async def _close_at_loop_exit() -> None:
+    """
+    ループの終了まで待機し、そのループの共有セッションをクローズする
+    asyncio.run（asgiref の async_to_sync も使用）は終了時に残りのタスクをキャンセルし、完了まで実行する
+    """
+    try:
+        await asyncio.Event().wait()
+    finally:
+        loop = asyncio.get_running_loop()
+        _closers.pop(loop, None)
+        session: Optional[aiohttp.ClientSession] = _sessions.pop(loop, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+async def close_session() -> None:
+    """現在のイベントループに対応する共有セッションをクローズ"""
+    loop = asyncio.get_running_loop()
+    closer = _closers.get(loop)
+    if closer is not None:
+        closer.cancel()
+        await asyncio.gather(closer, return_exceptions=True)
+    session: Optional[aiohttp.ClientSession] = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+async def startup() -> None:
+    """起動時フック: 共有セッションを事前に生成（以降はこのループのセッションを shutdown までクローズしない）"""
+    _lifespan_loops.add(asyncio.get_running_loop())
+    await get_session()
+    logger.info("Shared scraper HTTP session started")
+
+
+async def shutdown() -> None:
+    """終了時フック: 共有セッションと接続プールを解放"""
+    await close_session()
+    _lifespan_loops.discard(asyncio.get_running_loop())
+    logger.info("Shared scraper HTTP session closed")
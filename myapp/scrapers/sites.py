@@ -0,0 +1,71 @@
+"""
+対象サイトの定義
+サイトを追加する場合は SITE_SPECS に SiteSpec を追加する（検索は定義順に結果をマージする）
+"""
+from typing import Dict
+
+from .spec import PRICE, URL, FieldSpec, SiteSpec, build_scraper_class
+
+SITE_SPECS = (
+    # チャンプカメラ https://www.champcamera.co.jp/
+    SiteSpec(
+        name='ChampCameraScraper',
+        label='チャンプカメラ',
+        base_url='https://www.champcamera.co.jp/',
+        search_url_template='https://www.champcamera.co.jp/shop/used.php?keyword={keyword}',
+        container_selector='.used_list',
+        item_selector='.used_list .item',
+        pagination_selector='.pager .page-link',
+        fields={
+            'title': FieldSpec('.item_name'),
+            'price': FieldSpec('.price', PRICE),
+            'condition': FieldSpec('.rank'),
+            'image_url': FieldSpec('img', URL, 'src'),
+            'product_url': FieldSpec('a.item_link', URL, 'href'),
+        },
+    ),
+    # カメラのキタムラ https://shop.kitamura.jp/
+    SiteSpec(
+        name='KitamuraScraper',
+        label='カメラのキタムラ',
+        base_url='https://shop.kitamura.jp/',
+        search_url_template='https://shop.kitamura.jp/ec/list?keyword={keyword}',
+        container_selector='.product-list',
+        item_selector='.product-list .product-item',
+        pagination_selector='.pager .page-link',
+        fields={
+            'title': FieldSpec('.product-title'),
+            'price': FieldSpec('.product-price', PRICE),
+            'condition': FieldSpec('.product-condition'),
+            'image_url': FieldSpec('.product-image img', URL, 'src'),
+            'product_url': FieldSpec('a.product-link', URL, 'href'),
+        },
+    ),
+    # J-Camera https://j-camera.net/
+    SiteSpec(
+        name='JCameraScraper',
+        label='J-Camera',
+        base_url='https://j-camera.net/',
+        search_url_template='https://j-camera.net/listp.php?w={keyword}',
+        container_selector='.item-container',
+        item_selector='.item-container .item',
+        pagination_selector='.pager .page-link',
+        fields={
+            'title': FieldSpec('.item-title'),
+            'price': FieldSpec('.item-price', PRICE),
+            'condition': FieldSpec('.item-condition'),
+            'image_url': FieldSpec('.item-image img', URL, 'src'),
+            'product_url': FieldSpec('a.item-link', URL, 'href'),
+        },
+    ),
+)
+
+# スクレイパー名 -> スクレイパークラス（定義順）
+SCRAPER_CLASSES: Dict[str, type] = {spec.name: build_scraper_class(spec, __name__) for spec in SITE_SPECS}
+
+# パース用ワーカープロセスでクラスを名前で復元できるよう、モジュール属性として公開する
+globals().update(SCRAPER_CLASSES)
+
+ChampCameraScraper = SCRAPER_CLASSES['ChampCameraScraper']
+KitamuraScraper = SCRAPER_CLASSES['KitamuraScraper']
+JCameraScraper = SCRAPER_CLASSES['JCameraScraper']
@@ -0,0 +1,195 @@
+"""
+宣言的なサイト定義によるスクレイパー
+セレクタ・URLテンプレート・項目の抽出方法をデータ（SiteSpec）として定義し、
+セレクタはクラス生成時（import時）に一度だけコンパイルする
+"""
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import Tag
+
+from .base import BaseScraper
+from .parsers import CompiledSelector, SelectolaxNode
+from .result import FIELDS, ProductResult
+
+# 項目の抽出方法
+TEXT = 'text'    # 要素のテキスト（前後の空白を除去）
+PRICE = 'price'  # 要素のテキストから数字のみを取り出した整数（例: "¥123,456" -> 123456）
+URL = 'url'      # 要素の属性値をサイトのベースURLで絶対URLにしたもの
+
+EXTRACTORS = (TEXT, PRICE, URL)
+
+# 価格テキストから数字以外を除去する
+_NON_DIGITS = re.compile(r'[^\d]')
+
+
+class FieldSpec(NamedTuple):
+    """商品1件の1項目の定義"""
+    selector: str           # 商品要素内のCSSセレクタ
+    extractor: str = TEXT   # 抽出方法（TEXT / PRICE / URL）
+    attr: Optional[str] = None  # URLの場合に値を取る属性名
+
+
+class SiteSpec(NamedTuple):
+    """サイト毎のスクレイパー定義"""
+    name: str                    # スクレイパークラス名（結果・キャッシュのソース名）
+    label: str                   # 表示用のサイト名
+    base_url: str                # 相対URLの解決に使うベースURL
+    search_url_template: str     # 検索URL（{keyword} にキーワードが入る）
+    item_selector: str           # 商品1件の要素
+    fields: Dict[str, FieldSpec]  # 項目名 -> 項目の定義
+    container_selector: Optional[str] = None   # 商品一覧を囲む要素（部分パース用）
+    pagination_selector: Optional[str] = None  # ページ送りのリンク
+    delay: float = 1.5           # 同一ホストへのリクエスト間隔（秒）
+
+
+class CompiledField(NamedTuple):
+    """コンパイル済みの項目定義"""
+    name: str
+    selector: CompiledSelector
+    extractor: str
+    attr: Optional[str]
+
+
+def compile_fields(spec: SiteSpec) -> Tuple[CompiledField, ...]:
+    """
+    項目定義のセレクタをコンパイル
+    
+    Args:
+        spec (SiteSpec): サイト定義
+    
+    Returns:
+        Tuple[CompiledField, ...]: コンパイル済みの項目定義
+    
+    Raises:
+        ValueError: 抽出方法が不正な場合
+    """
+    compiled = []
+    for name, field in spec.fields.items():
+        if name not in FIELDS:
+            raise ValueError(f"{spec.name}.{name}: unknown field (expected one of {', '.join(FIELDS)})")
+        if field.extractor not in EXTRACTORS:
+            raise ValueError(f"{spec.name}.{name}: unknown extractor '{field.extractor}'")
+        if field.extractor == URL and not field.attr:
+            raise ValueError(f"{spec.name}.{name}: URL field needs attr")
+        compiled.append(CompiledField(name, CompiledSelector(field.selector), field.extractor, field.attr))
+    return tuple(compiled)
+
+
+class SpecScraper(BaseScraper):
+    """SiteSpec に従って商品情報を抽出するスクレイパー"""
+    
+    # build_scraper_class で設定される
+    spec: SiteSpec = None
+    item_selector: CompiledSelector = None
+    fields: Tuple[CompiledField, ...] = ()
+    
+    def __init__(self):
+        super().__init__(delay_seconds=self.spec.delay)
+        self.base_url = self.spec.base_url
+        self.search_url_template = self.spec.search_url_template
+    
+    def extract_items(self, soup) -> List[ProductResult]:
+        """
+        パース済みの検索結果ページから商品情報を抽出（ソース名設定済みのため format_result でコピーされない）
+        
+        Args:
+            soup: parse_html の結果
+        
+        Returns:
+            List[ProductResult]: 商品情報リスト
+        """
+        results = []
+        for item in self.item_selector.select(soup):
+            try:
+                elements = self._find_fields(item)
+                results.append(ProductResult(source=self.name, **{
+                    field.name: self._extract_value(field, elements.get(field.name))
+                    for field in self.fields
+                }))
+            except Exception:
+                # 個別の商品解析エラーはスキップして続行
+                continue
+        return results
+    
+    def _find_fields(self, item) -> Dict[str, Any]:
+        """
+        商品要素内で各項目のセレクタに最初に一致する要素を取得
+        BeautifulSoupの場合は子孫要素を1回だけ走査し、全項目を同時に照合する
+        
+        Args:
+            item: 商品1件の要素
+        
+        Returns:
+            Dict[str, Any]: 項目名 -> 要素（見つからない項目は含まない）
+        """
+        if isinstance(item, SelectolaxNode):
+            elements = {}
+            for field in self.fields:
+                element = field.selector.select_one(item)
+                if element is not None:
+                    elements[field.name] = element
+            return elements
+        
+        elements = {}
+        remaining = list(self.fields)
+        for tag in item.descendants:
+            if not isinstance(tag, Tag):
+                continue
+            matched = [field for field in remaining if field.selector.match(tag)]
+            if not matched:
+                continue
+            for field in matched:
+                elements[field.name] = tag
+            remaining = [field for field in remaining if field.name not in elements]
+            if not remaining:
+                break
+        return elements
+    
+    def _extract_value(self, field: CompiledField, element) -> Any:
+        """要素から項目の値を取り出す（要素がない場合は空文字・価格は0）"""
+        if field.extractor == PRICE:
+            return self._extract_price(element.text.strip() if element is not None else '0')
+        if element is None:
+            return ''
+        if field.extractor == URL:
+            value = element.attrs.get(field.attr)
+            return urljoin(self.base_url, value) if value is not None else ''
+        return element.text.strip()
+    
+    def _extract_price(self, price_text: str) -> int:
+        """
+        価格テキストから数値のみを抽出
+        
+        Args:
+            price_text (str): 価格テキスト (例: "¥123,456")
+        
+        Returns:
+            int: 価格 (例: 123456)
+        """
+        numbers = _NON_DIGITS.sub('', price_text)
+        return int(numbers) if numbers else 0
+
+
+def build_scraper_class(spec: SiteSpec, module: str) -> type:
+    """
+    サイト定義からスクレイパークラスを生成（セレクタはここで一度だけコンパイルする）
+    パース用ワーカープロセスへ送れるよう、生成したクラスは module の spec.name に配置すること
+    
+    Args:
+        spec (SiteSpec): サイト定義
+        module (str): クラスを配置するモジュール名
+    
+    Returns:
+        type: SpecScraper のサブクラス
+    """
+    return type(spec.name, (SpecScraper,), {
+        '__module__': module,
+        '__doc__': f"{spec.label}専用スクレイパー",
+        'spec': spec,
+        'item_selector': CompiledSelector(spec.item_selector),
+        'fields': compile_fields(spec),
+        'product_container_selector': spec.container_selector,
+        'pagination_selector': spec.pagination_selector,
+    })
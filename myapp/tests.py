@@ -1,3 +1,1062 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import pickle
+import time
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from aiohttp import web
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import metrics, utils
+from .codec import decode_results, encode_results
+from .exports import CHUNK_ROWS, PARQUET, is_available, iter_csv, iter_jsonl, iter_parquet
+from .datatables import ResultTable, get_result_table, table_cache
+from .cache import LRUCache, aget_cached_results, aget_cached_results_many, memory_cache
+from .keywords import canonicalize_keyword, normalize_keyword
+from .models import Product, SearchCache, SearchKeyword
+from .prewarm import get_prewarm_config, prewarm
+from .scrapers import executor
+from .scrapers.base import BaseScraper
+from .scrapers.sites import KitamuraScraper
+from .scrapers import httpcache, ratelimit
+from .scrapers.httpcache import FetchResult
+from .scrapers.result import ProductResult, ResultJSONEncoder
+from .scrapers.session import close_session, get_session
+from .scrapers.parsers import (
+    HTML_PARSER, LXML, SELECTOLAX, CompiledSelector, parse_document, resolve_backend, strainer_for,
+)
+from .scrapers.sites import SITE_SPECS
+from .scrapers.spec import PRICE, URL, FieldSpec, SiteSpec, build_scraper_class
+from .utils import search_all_sites
+
+
+class FakeScraper(BaseScraper):
+    """一定時間待機してから固定結果を返すテスト用スクレイパー"""
+    
+    # サイト毎の実際のスクレイピング回数
+    calls = Counter()
+    
+    def __init__(self, name, latency=0.2):
+        super().__init__(delay_seconds=0)
+        self.name = name
+        self.latency = latency
+    
+    async def search(self, keyword):
+        FakeScraper.calls[self.name] += 1
+        await asyncio.sleep(self.latency)
+        return self.format_result([{
+            'title': f'{keyword} ({self.name})',
+            'price': 1000,
+            'product_url': f'https://example.com/{self.name}/{keyword}',
+        }])
+    
+    def extract_items(self, soup):
+        return []
+
+
+class BarrierScraper(FakeScraper):
+    """他の検索と同時に実行中になるまで（バリアが揃うまで）待機するテスト用スクレイパー"""
+    
+    def __init__(self, name, barrier):
+        super().__init__(name, latency=0)
+        self.barrier = barrier
+    
+    async def search(self, keyword):
+        await self.barrier.wait()
+        return await super().search(keyword)
+
+
+def fake_scrapers(latency=0.2):
+    """get_all_scrapers の差し替え用ファクトリ"""
+    return lambda: [FakeScraper('FakeA', latency), FakeScraper('FakeB', latency)]
+
+
+class SearchTestCase(TestCase):
+    """プロセス内の状態をテスト毎に初期化する基底クラス"""
+    
+    def setUp(self):
+        FakeScraper.calls.clear()
+        memory_cache.clear()
+        ratelimit.reset_buckets()
+        httpcache.get_http_cache().clear()
+        table_cache.clear()
+
+
+class SharedSessionTests(SearchTestCase):
+    """共有HTTPセッションのテスト"""
+    
+    async def test_consecutive_fetches_reuse_session_and_connection(self):
+        # 接続元ポートが同じであれば、同じ接続（コネクタのプール）を再利用している
+        peers = []
+        
+        async def handle(request):
+            peers.append(request.transport.get_extra_info('peername'))
+            return web.Response(text='<html>ｶﾒﾗ</html>', content_type='text/html', charset='shift_jis')
+        
+        app = web.Application()
+        app.router.add_get('/', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/"
+        try:
+            scraper = FakeScraper('FakeA')
+            first = await scraper.fetch(url)
+            shared = await get_session()
+            second = await scraper.fetch(url)
+            self.assertIs(await get_session(), shared)
+        finally:
+            await close_session()
+            await runner.cleanup()
+        
+        self.assertEqual((first.html, second.html), ('<html>ｶﾒﾗ</html>',) * 2)
+        self.assertEqual(len(peers), 2)
+        self.assertEqual(peers[0], peers[1])
+    
+    def test_session_is_closed_when_loop_exits(self):
+        # lifespanのないループ（runserver・WSGIのリクエスト毎のループ）では、ループの終了時にクローズされる
+        shared = asyncio.run(get_session())
+        self.assertTrue(shared.closed)
+        self.assertTrue(shared.connector is None or shared.connector.closed)
+
+
+class SearchApiConcurrencyTests(SearchTestCase):
+    """非同期検索ビューの同時実行テスト"""
+    
+    async def test_concurrent_searches_share_one_process(self):
+        # 全検索の全サイトが同時に実行中になるまで各スクレイパーが待機する。逐次処理では揃わずに終わらない
+        n = 10
+        barrier = asyncio.Barrier(n * 2)
+        
+        def scrapers():
+            return [BarrierScraper('FakeA', barrier), BarrierScraper('FakeB', barrier)]
+        
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=scrapers):
+            responses = await asyncio.wait_for(asyncio.gather(*(
+                self.async_client.post('/api/search/', {'keyword': f'lens {i}'},
+                                       content_type='application/json')
+                for i in range(n)
+            )), timeout=10)
+        
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertTrue(all(response.json()['count'] == 2 for response in responses))
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': n, 'FakeB': n}))
+    
+    async def test_search_results_html_is_async(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0)):
+            response = await self.async_client.get('/search-results-html/', {'keyword': 'EOS R5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'eos r5 (FakeA)')
+
+
+class SingleFlightTests(SearchTestCase):
+    """同一検索の相乗りテスト"""
+    
+    async def test_identical_burst_scrapes_each_site_once(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0.1)):
+            results = await asyncio.gather(*(
+                search_all_sites(keyword) for keyword in ['EOS R5', 'eos r5', ' EOS  R5 '] * 4
+            ))
+        
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1, 'FakeB': 1}))
+        self.assertTrue(all(set(result) == {'FakeA', 'FakeB'} for result in results))
+
+
+class StaleWhileRevalidateTests(SearchTestCase):
+    """期限切れキャッシュの即時返却と裏での再取得のテスト"""
+    
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        for source in ('FakeA', 'FakeB'):
+            SearchCache.objects.create(
+                keyword='eos r5', source=source,
+                results_json=[{'title': 'old', 'price': 1, 'source': source}],
+                expires_at=now - timedelta(minutes=1),
+                stale_until=now + timedelta(hours=1),
+            )
+    
+    async def test_stale_cache_is_served_and_refreshed(self):
+        meta = {}
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0.05)):
+            results = await search_all_sites('EOS R5', meta=meta)
+            
+            self.assertEqual(results['FakeA'][0]['title'], 'old')
+            self.assertEqual(meta['freshness'], {'FakeA': 'stale', 'FakeB': 'stale'})
+            
+            await asyncio.gather(*utils._background_tasks)
+        
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1, 'FakeB': 1}))
+        cache = await SearchCache.objects.aget(keyword='eos r5', source='FakeA')
+        self.assertEqual(cache.freshness, SearchCache.FRESH)
+        self.assertEqual(cache.results[0]['title'], 'eos r5 (FakeA)')
+    
+    def test_cache_past_hard_ttl_is_dropped(self):
+        SearchCache.objects.update(stale_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(SearchCache.get_cache_with_freshness('eos r5', 'FakeA'), (None, None))
+        self.assertFalse(SearchCache.objects.filter(source='FakeA').exists())
+    
+    def test_bulk_lookup_uses_single_query(self):
+        with self.assertNumQueries(1):
+            caches = async_to_sync(SearchCache.aget_caches_with_freshness)(
+                'eos r5', ['FakeA', 'FakeB', 'FakeC'])
+        self.assertEqual(set(caches), {'FakeA', 'FakeB'})
+        self.assertEqual(caches['FakeA'][1], SearchCache.STALE)
+
+
+class TwoTierCacheTests(SearchTestCase):
+    """プロセス内LRUキャッシュのテスト"""
+    
+    def test_lru_eviction_ttl_and_counters(self):
+        cache = LRUCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)  # 'b' が最も古く使われたエントリ
+        self.assertIsNone(cache.get('b'))
+        cache.set('d', 4, ttl=-1)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.stats(), {
+            'hits': 1, 'misses': 2, 'hit_rate': 1 / 3, 'evictions': 2, 'size': 1, 'max_entries': 2,
+        })
+    
+    def test_second_lookup_is_served_from_memory(self):
+        SearchCache.create_cache('EOS R5', 'FakeA', [{'title': 'cached', 'price': 1}])
+        lookup = async_to_sync(aget_cached_results)
+        
+        with self.assertNumQueries(1):
+            first = lookup('EOS R5', ['FakeA'])
+        with self.assertNumQueries(0):
+            second = lookup('EOS R5', ['FakeA'])
+        
+        self.assertEqual(first, second)
+        self.assertEqual(second['FakeA'][1], SearchCache.FRESH)
+        self.assertEqual((memory_cache.hits, memory_cache.misses), (1, 1))
+    
+    async def test_stale_memory_entry_rechecks_database(self):
+        # メモリ層のエントリは期限切れだが、他のワーカーがデータベースの行を更新済み
+        now = timezone.now()
+        memory_cache.set(('eos r5', 'FakeA'), ([ProductResult('old')], now - timedelta(minutes=1),
+                                               now + timedelta(hours=1)))
+        await sync_to_async(SearchCache.create_cache)('eos r5', 'FakeA', [{'title': 'refreshed', 'price': 1}])
+        
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0)):
+            meta = {}
+            results = await search_all_sites('EOS R5', sources=['FakeA'], meta=meta)
+            await asyncio.gather(*utils._background_tasks)
+        
+        self.assertEqual(results['FakeA'][0].title, 'refreshed')
+        self.assertEqual(meta['freshness'], {'FakeA': SearchCache.FRESH})
+        self.assertEqual(FakeScraper.calls, Counter())
+        self.assertEqual(memory_cache.get(('eos r5', 'FakeA'))[0][0].title, 'refreshed')
+
+
+class KeywordCanonicalizationTests(SearchTestCase):
+    """キーワード正規化のテスト"""
+    
+    def test_variants_share_one_canonical_key(self):
+        variants = ['EOS R5', 'eos r5', 'ＥＯＳ　Ｒ５', 'EOS  R5', ' R5 EOS ']
+        self.assertEqual({canonicalize_keyword(keyword) for keyword in variants}, {'eos r5'})
+    
+    def test_query_keeps_word_order(self):
+        self.assertEqual(normalize_keyword(' R5  ＥＯＳ'), 'r5 eos')
+    
+    def test_operators_keep_word_order(self):
+        self.assertEqual(canonicalize_keyword('Nikon -Z'), 'nikon -z')
+        self.assertEqual(canonicalize_keyword('"Z 50" Nikon'), '"z 50" nikon')
+    
+    async def test_full_width_search_hits_half_width_cache(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0)):
+            await search_all_sites('EOS R5')
+            meta = {}
+            await search_all_sites('ＥＯＳ　Ｒ５', meta=meta)
+        
+        self.assertEqual(meta['freshness'], {'FakeA': 'fresh', 'FakeB': 'fresh'})
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1, 'FakeB': 1}))
+
+
+class SearchStreamTests(SearchTestCase):
+    """ストリーミング検索APIのテスト"""
+    
+    async def test_sites_are_streamed_in_completion_order(self):
+        def scrapers():
+            return [FakeScraper('Slow', 0.2), FakeScraper('Fast', 0)]
+        
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=scrapers):
+            response = await self.async_client.get('/api/search/stream/', {'keyword': 'EOS R5'})
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([(r['type'], r.get('source')) for r in records],
+                         [('site', 'Fast'), ('site', 'Slow'), ('summary', None)])
+        self.assertEqual(records[-1]['count'], 2)
+    
+    async def test_results_html_can_stream(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(0)):
+            response = await self.async_client.get('/search-results-html/', {'keyword': 'EOS R5', 'stream': '1'})
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        
+        self.assertEqual(body.count('<tbody data-source='), 2)
+        self.assertIn('検索結果 2件', body)
+
+
+class PartialScraper(FakeScraper):
+    """1件目を整形した後に応答が止まるテスト用スクレイパー"""
+    
+    async def search(self, keyword):
+        FakeScraper.calls[self.name] += 1
+        self.partial_results.extend(self.format_result([{'title': f'{keyword} (partial)', 'price': 500}]))
+        await asyncio.sleep(self.latency)
+        return self.partial_results
+
+
+class SearchDeadlineTests(SearchTestCase):
+    """検索の締め切りと部分結果のテスト"""
+    
+    def scrapers(self):
+        return [FakeScraper('Fast', 0), FakeScraper('Stuck', 5), PartialScraper('Partial', 5)]
+    
+    async def test_deadline_returns_partial_results(self):
+        meta = {}
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=self.scrapers):
+            start = time.perf_counter()
+            results = await search_all_sites('EOS R5', meta=meta, deadline=0.2)
+            elapsed = time.perf_counter() - start
+        
+        self.assertLess(elapsed, 1)
+        self.assertEqual(sorted(meta['timed_out']), ['Partial', 'Stuck'])
+        self.assertEqual(meta['freshness']['Fast'], 'live')
+        self.assertEqual(results['Stuck'], [])
+        self.assertEqual(results['Partial'][0]['title'], 'eos r5 (partial)')
+    
+    async def test_partial_results_use_shorter_ttl(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=self.scrapers):
+            await search_all_sites('EOS R5', deadline=0.2)
+        
+        complete = await SearchCache.objects.aget(keyword='eos r5', source='Fast')
+        partial = await SearchCache.objects.aget(keyword='eos r5', source='Partial')
+        self.assertLess(partial.expires_at, complete.expires_at)
+        self.assertEqual(partial.stale_until, partial.expires_at)
+        self.assertFalse(await SearchCache.objects.filter(source='Stuck').aexists())
+        
+        # 部分結果の有効期間を過ぎると、期限切れ（STALE）として返さずに破棄する
+        later = partial.expires_at + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(partial.freshness, SearchCache.EXPIRED)
+            self.assertEqual(complete.freshness, SearchCache.FRESH)
+    
+    @override_settings(SEARCH_DEADLINES={'default': 20, 'Stuck': 0.1, 'Partial': 0.1})
+    async def test_per_source_deadline(self):
+        meta = {}
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=self.scrapers):
+            await search_all_sites('EOS R5', meta=meta)
+        self.assertEqual(sorted(meta['timed_out']), ['Partial', 'Stuck'])
+
+
+KITAMURA_PAGE = """
+<div class="product-list">
+  <div class="product-item">
+    <div class="product-image"><img src="/images/1.jpg"></div>
+    <a class="product-link" href="/ec/used/1"><span class="product-title"> Canon EOS R5 </span></a>
+    <p class="product-price">&yen;398,000</p><p class="product-condition">A</p>
+  </div>
+  <div class="product-item"><span class="product-title">Nikon Z 50</span></div>
+</div>
+"""
+
+
+class ParserBackendTests(SearchTestCase):
+    """HTMLパーサーバックエンドのテスト"""
+    
+    async def scrape(self, backend):
+        scraper = KitamuraScraper()
+        scraper.parser_backend = backend
+        # 前のバックエンドの抽出結果を再利用しない
+        httpcache.get_http_cache().clear()
+        with mock.patch.object(scraper, 'fetch', return_value=FetchResult(200, KITAMURA_PAGE)):
+            return await scraper.search('eos')
+    
+    async def test_backends_extract_identical_items(self):
+        expected = await self.scrape(HTML_PARSER)
+        self.assertEqual(expected[0]['title'], 'Canon EOS R5')
+        self.assertEqual(expected[0]['price'], 398000)
+        self.assertEqual(expected[0]['product_url'], 'https://shop.kitamura.jp/ec/used/1')
+        self.assertEqual(expected[1]['image_url'], '')
+        for backend in (LXML, SELECTOLAX):
+            with self.subTest(backend=backend):
+                self.assertEqual(await self.scrape(backend), expected)
+    
+    def test_container_only_parse(self):
+        page = '<nav><a href="/">top</a></nav>' + KITAMURA_PAGE
+        for backend in (HTML_PARSER, LXML):
+            with self.subTest(backend=backend):
+                soup = parse_document(page, backend, only='div.product-list')
+                self.assertEqual(len(soup.select('.product-list .product-item')), 2)
+                self.assertIsNone(soup.select_one('nav'))
+    
+    def test_strainer_needs_simple_selector(self):
+        self.assertIsNotNone(strainer_for('ul.used_list.wide'))
+        self.assertIsNotNone(strainer_for('.item-container .item', '.pager > a'))
+        self.assertIsNone(strainer_for('.item-container + .item'))
+        self.assertIsNone(strainer_for('.item-container', 'a[href]'))
+    
+    def test_unavailable_backend_falls_back(self):
+        with mock.patch('myapp.scrapers.parsers._is_available', return_value=False):
+            self.assertEqual(resolve_backend(SELECTOLAX), HTML_PARSER)
+
+
+def kitamura_page(page, count=2, pages=5):
+    """ページ送り付きの検索結果ページ（各ページの先頭の商品は前ページの末尾と重複）"""
+    items = ''.join(
+        f'<div class="product-item"><a class="product-link" href="/ec/used/{n}">'
+        f'<span class="product-title">item {n}</span></a></div>'
+        for n in range((page - 1) * count, page * count + 1)
+    )
+    links = ''.join(f'<a class="page-link" href="/ec/list?keyword=eos&page={n}">{n}</a>' for n in range(2, pages + 1))
+    return f'<div class="product-list">{items}</div><div class="pager">{links}</div>'
+
+
+class PaginationTests(SearchTestCase):
+    """複数ページの取得テスト"""
+    
+    def scraper(self, max_pages):
+        scraper = KitamuraScraper()
+        scraper.max_pages = max_pages
+        scraper.requested = []
+        
+        async def fetch(url, conditional_headers=None):
+            scraper.requested.append(url)
+            page = int(url.rsplit('page=', 1)[1]) if 'page=' in url else 1
+            return FetchResult(200, kitamura_page(page))
+        
+        scraper.fetch = fetch
+        return scraper
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'})
+    async def test_pages_are_merged_without_duplicates(self):
+        scraper = self.scraper(max_pages=3)
+        results = await scraper.search('eos')
+        
+        self.assertEqual(len(scraper.requested), 3)
+        self.assertEqual(sorted(item['product_url'] for item in results),
+                         [f'https://shop.kitamura.jp/ec/used/{n}' for n in range(7)])
+        self.assertEqual(results[0]['title'], 'item 0')
+        self.assertEqual(scraper.partial_results, results)
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'})
+    async def test_single_page(self):
+        scraper = self.scraper(max_pages=1)
+        results = await scraper.search('eos')
+        
+        self.assertEqual(scraper.requested, ['https://shop.kitamura.jp/ec/list?keyword=eos'])
+        self.assertEqual(len(results), 3)
+
+
+class HttpCacheTests(SearchTestCase):
+    """条件付きGETによるHTTPキャッシュのテスト"""
+    
+    def scraper(self, responses):
+        scraper = KitamuraScraper()
+        scraper.max_pages = 1
+        scraper.sent_headers = []
+        
+        async def fetch(url, conditional_headers=None):
+            scraper.sent_headers.append(conditional_headers)
+            return responses.pop(0)
+        
+        scraper.fetch = fetch
+        return scraper
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'})
+    async def test_not_modified_reuses_parsed_results(self):
+        scraper = self.scraper([
+            FetchResult(200, KITAMURA_PAGE, '"v1"', 'Sat, 17 Oct 2026 00:00:00 GMT'),
+            FetchResult(304),
+        ])
+        first = await scraper.search('eos')
+        with mock.patch.object(KitamuraScraper, 'extract') as extract:
+            second = await scraper.search('eos')
+        
+        extract.assert_not_called()
+        self.assertEqual(second, first)
+        self.assertEqual(scraper.sent_headers, [None, {
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'Sat, 17 Oct 2026 00:00:00 GMT',
+        }])
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'})
+    async def test_unchanged_body_skips_parse(self):
+        scraper = self.scraper([FetchResult(200, KITAMURA_PAGE), FetchResult(200, KITAMURA_PAGE),
+                                FetchResult(200, kitamura_page(1))])
+        first = await scraper.search('eos')
+        with mock.patch.object(KitamuraScraper, 'extract', wraps=scraper.extract) as extract:
+            self.assertEqual(await scraper.search('eos'), first)
+            extract.assert_not_called()
+            changed = await scraper.search('eos')
+            extract.assert_called_once()
+        
+        self.assertEqual(scraper.sent_headers, [None, {}, {}])
+        self.assertEqual(changed[0]['title'], 'item 0')
+
+
+class RateLimitTests(SearchTestCase):
+    """ホスト単位のレート制限のテスト"""
+    
+    async def test_burst_passes_without_waiting(self):
+        bucket = ratelimit.TokenBucket(rate=10, burst=3)
+        start = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+        self.assertLess(time.perf_counter() - start, 0.05)
+    
+    async def test_concurrent_requests_are_spaced(self):
+        bucket = ratelimit.TokenBucket(rate=20, burst=1)
+        start = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+        # 1件目は即時、残り4件は 1/20 秒間隔
+        self.assertGreaterEqual(time.perf_counter() - start, 0.19)
+    
+    async def test_cancelled_wait_refunds_token(self):
+        bucket = ratelimit.TokenBucket(rate=1, burst=1)
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertLessEqual(bucket.reserve(), 1)
+    
+    def test_bucket_is_shared_per_host(self):
+        bucket = ratelimit.get_bucket('https://shop.kitamura.jp/ec/list?keyword=a', delay=1.5)
+        self.assertIs(ratelimit.get_bucket('https://SHOP.kitamura.jp/ec/list?page=2', delay=1.5), bucket)
+        self.assertIsNot(ratelimit.get_bucket('https://j-camera.net/', delay=1.5), bucket)
+        self.assertAlmostEqual(bucket.rate, 1 / 1.5)
+        self.assertIsNone(ratelimit.get_bucket('https://example.com/', delay=0))
+    
+    @override_settings(SCRAPER_RATE_LIMIT={'default': {'BURST': 5}, 'j-camera.net': {'RATE': 4}})
+    def test_rate_from_settings(self):
+        bucket = ratelimit.get_bucket('https://j-camera.net/', delay=1.5)
+        self.assertEqual((bucket.rate, bucket.burst), (4, 5))
+
+
+class ProductIndexTests(SearchTestCase):
+    """商品索引とローカル検索のテスト"""
+    
+    async def test_scrape_upserts_products(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            await search_all_sites('EOS R5')
+            await search_all_sites('EOS R5', use_cache=False)
+        
+        self.assertEqual(await Product.objects.acount(), 2)
+        product = await Product.objects.aget(source='FakeA')
+        self.assertEqual((product.title, product.price), ('eos r5 (FakeA)', 1000))
+        self.assertGreater(product.last_seen_at, product.first_seen_at)
+    
+    async def test_upsert_updates_existing_rows(self):
+        result = {'title': 'Canon EOS R5', 'price': 398000, 'product_url': 'https://example.com/1'}
+        await Product.aupsert_results('KitamuraScraper', [result, {'title': 'no url'}])
+        await Product.aupsert_results('KitamuraScraper', [dict(result, price=380000)])
+        
+        product = await Product.objects.aget()
+        self.assertEqual(product.price, 380000)
+    
+    async def test_local_search_mode_does_not_scrape(self):
+        await Product.aupsert_results('FakeA', [
+            {'title': 'Canon EOS R5 ボディ', 'price': 398000, 'product_url': 'https://example.com/1'},
+            {'title': 'Canon EOS R6', 'price': 298000, 'product_url': 'https://example.com/2'},
+        ])
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers()):
+            response = await self.async_client.post('/api/search/', {'keyword': 'ｅｏｓ  r5', 'mode': 'local'},
+                                                    content_type='application/json')
+        
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['product_url'], 'https://example.com/1')
+        self.assertEqual(data['freshness'], {'FakeA': 'local', 'FakeB': 'local'})
+        self.assertEqual(sum(FakeScraper.calls.values()), 0)
+
+
+class PrewarmTests(SearchTestCase):
+    """人気キーワードの事前取得のテスト"""
+    
+    async def test_searches_are_counted_by_canonical_keyword(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            for keyword in ('EOS R5', 'eos r5', 'R5 EOS'):
+                await search_all_sites(keyword)
+            await asyncio.gather(*utils._background_tasks)
+        
+        keyword = await SearchKeyword.objects.aget()
+        # 事前取得ではサイトへの検索クエリとして直近に入力された語順を使う
+        self.assertEqual((keyword.keyword, keyword.query, keyword.search_count), ('eos r5', 'r5 eos', 3))
+    
+    async def test_prewarm_refreshes_due_caches_within_budget(self):
+        await SearchKeyword.objects.acreate(keyword='eos r5', query='r5 eos', search_count=10)
+        await SearchKeyword.objects.acreate(keyword='z 6', search_count=5)
+        await SearchCache.objects.acreate(
+            keyword='eos r5', source='FakeA', results_json=[],
+            expires_at=timezone.now() + timedelta(hours=1), stale_until=timezone.now() + timedelta(days=1),
+        )
+        
+        # 1サイトの検索で最大3ページ取得し得るため、予算6では2サイトまで
+        config = get_prewarm_config(BUDGET=6, LEAD=600)
+        with mock.patch('myapp.prewarm.get_all_scrapers', side_effect=fake_scrapers(latency=0)), \
+                override_settings(SCRAPER_MAX_PAGES=3):
+            stats = await prewarm(config)
+        
+        self.assertEqual(stats, {'keywords': 2, 'refreshed': 2, 'skipped': 1, 'budget_used': 6})
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1, 'FakeB': 1}))
+        cache = await SearchCache.objects.aget(keyword='eos r5', source='FakeB')
+        self.assertEqual(cache.results[0].title, 'r5 eos (FakeB)')
+        self.assertTrue(await SearchCache.objects.filter(keyword='z 6', source='FakeA').aexists())
+
+
+class ProductResultTests(SearchTestCase):
+    """検索結果レコードのテスト"""
+    
+    def test_record_reads_like_a_dict(self):
+        result = ProductResult('EOS R5', 398000, 'A', product_url='https://example.com/1', source='FakeA')
+        
+        self.assertEqual((result['price'], result.get('condition'), result.get('missing', 0)), (398000, 'A', 0))
+        self.assertEqual(result, dict(result))
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+        self.assertEqual(json.loads(json.dumps([result], cls=ResultJSONEncoder)), [result.to_dict()])
+        with self.assertRaises(KeyError):
+            result['missing']
+    
+    def test_format_result_does_not_copy_own_records(self):
+        scraper = FakeScraper('FakeA')
+        own = ProductResult('EOS R5', 1, source='FakeA')
+        formatted = scraper.format_result([own, ProductResult('EOS R6', 2, source='FakeB'), {'title': 'EOS RP'}])
+        
+        self.assertIs(formatted[0], own)
+        self.assertEqual([result.source for result in formatted], ['FakeA'] * 3)
+        self.assertEqual(formatted[2], ProductResult('EOS RP', source='FakeA'))
+    
+    async def test_api_serializes_records(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            response = await self.async_client.post('/api/search/', {'keyword': 'EOS R5'},
+                                                    content_type='application/json')
+        
+        self.assertEqual(response.json()['results'][0], {
+            'title': 'eos r5 (FakeA)', 'price': 1000, 'condition': '', 'image_url': '',
+            'product_url': 'https://example.com/FakeA/eos r5', 'source': 'FakeA',
+        })
+
+
+class CompactResultsTests(SearchTestCase):
+    """キャッシュする検索結果のコンパクト形式のテスト"""
+    
+    def test_round_trip(self):
+        results = [
+            {'title': 'EOS R5', 'price': 398000, 'condition': 'A', 'source': 'KitamuraScraper'},
+            {'title': 'EOS R6', 'price': 298000, 'condition': None, 'source': 'KitamuraScraper', 'extra': [1]},
+            {'title': 'ニコン Z6', 'source': 'JCameraScraper'},
+        ]
+        data = encode_results(results)
+        self.assertEqual(decode_results(data), results)
+        self.assertEqual(decode_results(encode_results([])), [])
+        self.assertLess(len(data), len(json.dumps(results)))
+        with self.assertRaises(ValueError):
+            decode_results(b'[]')
+    
+    def test_cache_rows_use_compact_format(self):
+        results = [ProductResult('EOS R5', 1, source='FakeA')]
+        SearchCache.create_cache('eos r5', 'FakeA', results)
+        
+        cache = SearchCache.objects.get()
+        self.assertIsNone(cache.results_json)
+        self.assertEqual(cache.results, results)
+        
+        # 旧形式の行もそのまま読める
+        SearchCache.objects.update(results_json=[{'title': 'EOS R5', 'price': 1, 'source': 'FakeA'}], results_data=None)
+        self.assertEqual(SearchCache.objects.get().results, results)
+
+
+class CompactResultsMigrationTests(TransactionTestCase):
+    """キャッシュ結果の保存形式を変換するマイグレーション（0007）のテスト"""
+    
+    before = [('myapp', '0006_searchkeyword')]
+    after = [('myapp', '0007_searchcache_compact_results')]
+    
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps.get_model('myapp', 'SearchCache')
+    
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+    
+    def test_forward_and_back(self):
+        results = [
+            {'title': 'EOS R5', 'price': 398000, 'condition': 'A', 'image_url': '', 'product_url': 'https://a/1',
+             'source': 'FakeA'},
+            {'title': 'EOS R6', 'price': 298000, 'source': 'FakeA'},
+        ]
+        now = timezone.now()
+        self.migrate(self.before).objects.create(keyword='eos r5', source='FakeA', results_json=results,
+                                                 expires_at=now, stale_until=now)
+        
+        cache = self.migrate(self.after).objects.get()
+        self.assertIsNone(cache.results_json)
+        expected = [ProductResult.from_dict(result) for result in results]
+        self.assertEqual(decode_results(cache.results_data), expected)
+        
+        cache = self.migrate(self.before).objects.get()
+        self.assertEqual(cache.results_json, results)
+
+
+class BatchSearchTests(SearchTestCase):
+    """複数キーワードの一括検索のテスト"""
+    
+    async def post_batch(self, payload):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            response = await self.async_client.post('/api/search/batch/', payload, content_type='application/json')
+            if response.status_code != 200:
+                return response, None
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        return response, [json.loads(line) for line in body.decode().splitlines()]
+    
+    def test_cache_lookup_for_all_keywords_is_one_query(self):
+        SearchCache.create_cache('eos r5', 'FakeA', [{'title': 'cached', 'price': 1}])
+        SearchCache.create_cache('nikon z6', 'FakeB', [{'title': 'cached', 'price': 2}])
+        memory_cache.clear()
+        
+        with self.assertNumQueries(1):
+            caches = async_to_sync(aget_cached_results_many)(['eos r5', 'nikon z6', 'leica m6'], ['FakeA', 'FakeB'])
+        
+        self.assertEqual({keyword: set(found) for keyword, found in caches.items()},
+                         {'eos r5': {'FakeA'}, 'nikon z6': {'FakeB'}, 'leica m6': set()})
+    
+    async def test_results_are_streamed_per_keyword(self):
+        await utils.create_cache_async('eos r5', 'FakeA', [ProductResult('cached', 1, source='FakeA')])
+        
+        response, records = await self.post_batch({'keywords': ['EOS R5', 'ｅｏｓ　Ｒ５', 'Nikon Z6'], 'sources': ['FakeA']})
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        by_keyword = {record['keyword']: record for record in records if record['type'] == 'keyword'}
+        self.assertEqual(set(by_keyword), {'EOS R5', 'Nikon Z6'})
+        self.assertEqual(by_keyword['EOS R5']['freshness'], {'FakeA': 'fresh'})
+        self.assertEqual(by_keyword['Nikon Z6']['results'][0]['title'], 'nikon z6 (FakeA)')
+        self.assertEqual(records[-1], {'type': 'summary', 'count': 2})
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1}))
+    
+    @override_settings(SEARCH_BATCH={'CONCURRENCY': 1})
+    async def test_cached_keywords_do_not_wait_for_scraping(self):
+        await utils.create_cache_async('eos r5', 'FakeA', [ProductResult('cached', 1, source='FakeA')])
+        
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0.05)):
+            keywords = [keyword async for keyword, _, _ in utils.iter_search_batch(
+                ['Nikon Z6', 'Leica M6', 'EOS R5'], sources=['FakeA'])]
+            await asyncio.gather(*utils._background_tasks)
+        
+        self.assertEqual(keywords, ['EOS R5', 'Nikon Z6', 'Leica M6'])
+        # 一括検索は人気キーワードの集計に含めない
+        self.assertFalse(await SearchKeyword.objects.aexists())
+    
+    async def test_invalid_requests(self):
+        response, _ = await self.post_batch({'keywords': ['EOS R5'], 'sources': ['Unknown']})
+        self.assertEqual(response.status_code, 400)
+        response, _ = await self.post_batch({'keywords': ['EOS R5'], 'sources': [{'x': 1}]})
+        self.assertEqual(response.status_code, 400)
+        response, _ = await self.post_batch({'keywords': []})
+        self.assertEqual(response.status_code, 400)
+        with override_settings(SEARCH_BATCH={'MAX_KEYWORDS': 1}):
+            response, _ = await self.post_batch({'keywords': ['EOS R5', 'Nikon Z6']})
+        self.assertEqual(response.status_code, 400)
+
+
+class ResultTableTests(SearchTestCase):
+    """検索結果テーブル（server-side processing）のテスト"""
+    
+    RESULTS = {
+        'KitamuraScraper': [
+            ProductResult('EOS R5', 398000, 'A', source='KitamuraScraper'),
+            ProductResult('eos R6', 298000, 'B', source='KitamuraScraper'),
+        ],
+        'JCameraScraper': [
+            ProductResult('Nikon Z6', 198000, 'A', source='JCameraScraper'),
+            ProductResult('EOS RP', 98000, 'C', source='JCameraScraper'),
+        ],
+    }
+    
+    def titles(self, page):
+        return [row['title'] for row in page['rows']]
+    
+    def test_sort_filter_and_page(self):
+        table = ResultTable(self.RESULTS)
+        
+        page = table.query(start=1, length=2)
+        self.assertEqual((page['total'], page['filtered']), (4, 4))
+        self.assertEqual(self.titles(page), ['Nikon Z6', 'eos R6'])
+        self.assertEqual(self.titles(table.query(sort='title', descending=True, length=4)),
+                         ['Nikon Z6', 'EOS RP', 'eos R6', 'EOS R5'])
+        
+        page = table.query(min_price=100000, max_price=298000)
+        self.assertEqual((page['filtered'], self.titles(page)), (2, ['Nikon Z6', 'eos R6']))
+        page = table.query(sort='source', min_price=100000, conditions=['A'], search='eos')
+        self.assertEqual(self.titles(page), ['EOS R5'])
+        self.assertEqual(table.query(sources=['JCameraScraper'], descending=True)['filtered'], 2)
+    
+    def test_descending_sort_keeps_tiebreak_ascending(self):
+        # 降順でも同値の行は価格・取得順の昇順のまま
+        table = ResultTable({'FakeA': [
+            ProductResult('EOS R5', 300, source='FakeA'),
+            ProductResult('EOS R5', 100, source='FakeA'),
+            ProductResult('Z6', 100, source='FakeA'),
+            ProductResult('Z6', 200, source='FakeA'),
+        ]})
+        
+        page = table.query(sort='title', descending=True)
+        self.assertEqual([(row['title'], row['price']) for row in page['rows']],
+                         [('Z6', 100), ('Z6', 200), ('EOS R5', 100), ('EOS R5', 300)])
+        page = table.query(descending=True, min_price=100, max_price=200)
+        self.assertEqual([(row['title'], row['price']) for row in page['rows']],
+                         [('Z6', 200), ('EOS R5', 100), ('Z6', 100)])
+        self.assertEqual([row.price for row in table.iter_rows(descending=True)], [300, 200, 100, 100])
+        self.assertEqual([row.title for row in table.iter_rows(descending=True)][2:], ['EOS R5', 'Z6'])
+    
+    def test_table_is_rebuilt_only_when_cache_changes(self):
+        table = get_result_table('eos', self.RESULTS)
+        self.assertIs(get_result_table('eos', dict(self.RESULTS)), table)
+        
+        refreshed = dict(self.RESULTS, JCameraScraper=list(self.RESULTS['JCameraScraper']))
+        self.assertIsNot(get_result_table('eos', refreshed), table)
+    
+    async def test_datatables_request(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            response = await self.async_client.get('/api/search/table/', {
+                'keyword': 'EOS R5', 'draw': '3', 'start': '0', 'length': '1',
+                'columns[0][data]': 'source', 'order[0][column]': '0', 'order[0][dir]': 'desc',
+            })
+        
+        data = response.json()
+        self.assertEqual((data['draw'], data['recordsTotal'], data['recordsFiltered']), (3, 2, 2))
+        self.assertEqual([row['source'] for row in data['data']], ['FakeB'])
+        self.assertEqual(data['freshness'], {'FakeA': 'live', 'FakeB': 'live'})
+    
+    async def test_later_draws_are_served_from_the_table(self):
+        params = {'keyword': 'EOS R5', 'start': '0', 'length': '10'}
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            await self.async_client.get('/api/search/table/', {**params, 'draw': '1'})
+            # ページ送り・並べ替え・検索欄の入力毎の描画
+            responses = [await self.async_client.get('/api/search/table/', {**params, 'draw': str(draw),
+                                                                            'search[value]': 'fakeb'[:draw]})
+                         for draw in range(2, 6)]
+            await asyncio.gather(*utils._background_tasks)
+        
+        self.assertEqual(FakeScraper.calls, Counter({'FakeA': 1, 'FakeB': 1}))
+        self.assertEqual((await SearchKeyword.objects.aget()).search_count, 1)
+        self.assertEqual(responses[-1].json()['recordsFiltered'], 1)
+        self.assertEqual(responses[-1].json()['freshness'], {'FakeA': 'live', 'FakeB': 'live'})
+        
+        # テーブルを保持していない場合は検索する
+        table_cache.clear()
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            response = await self.async_client.get('/api/search/table/', {**params, 'draw': '6'})
+            await asyncio.gather(*utils._background_tasks)
+        self.assertEqual(response.json()['freshness'], {'FakeA': 'fresh', 'FakeB': 'fresh'})
+        self.assertEqual((await SearchKeyword.objects.aget()).search_count, 2)
+
+
+class ExportTests(SearchTestCase):
+    """検索結果のエクスポートのテスト"""
+    
+    async def streamed(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content]).decode()
+    
+    def test_writers_emit_bounded_chunks(self):
+        rows = ({'title': f'EOS {i}', 'price': i} for i in range(CHUNK_ROWS * 2 + 1))
+        chunks = list(iter_csv(rows))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0].splitlines()[:2], ['title,price,condition,source,product_url,image_url',
+                                                      'EOS 0,0,,,,'])
+        
+        lines = ''.join(iter_jsonl([{'title': 'ニコン "Z6"', 'price': 1}])).splitlines()
+        self.assertEqual(json.loads(lines[0])['title'], 'ニコン "Z6"')
+    
+    @unittest.skipUnless(is_available(PARQUET), 'pyarrow is not installed')
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet
+        
+        rows = [{'title': f'EOS {i}', 'price': i, 'source': 'FakeA'} for i in range(CHUNK_ROWS + 1)]
+        chunks = list(iter_parquet(iter(rows)))
+        self.assertEqual(len(chunks), 2)
+        
+        table = pyarrow.parquet.read_table(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(table.num_rows, len(rows))
+        self.assertEqual(table.to_pylist()[-1], {
+            'title': f'EOS {CHUNK_ROWS}', 'price': CHUNK_ROWS, 'condition': None, 'source': 'FakeA',
+            'product_url': None, 'image_url': None,
+        })
+    
+    async def test_export_is_served_from_cache(self):
+        await utils.create_cache_async('eos r5', 'FakeA', [
+            {'title': 'EOS R5 B', 'price': 2000, 'source': 'FakeA'},
+            {'title': 'EOS R5 A', 'price': 1000, 'source': 'FakeA'},
+        ])
+        await utils.create_cache_async('eos r5', 'FakeB', [{'title': 'EOS R5 C', 'price': 1500, 'source': 'FakeB'}])
+        
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers()):
+            response = await self.async_client.get('/export/', {'keyword': 'EOS R5', 'format': 'jsonl'})
+            body = await self.streamed(response)
+            csv_response = await self.async_client.get('/export-csv/', {'keyword': 'EOS R5'})
+        
+        self.assertEqual(sum(FakeScraper.calls.values()), 0)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="camera_search_EOS R5.jsonl"')
+        self.assertEqual([json.loads(line)['title'] for line in body.splitlines()], ['EOS R5 A', 'EOS R5 C', 'EOS R5 B'])
+        self.assertEqual(len((await self.streamed(csv_response)).splitlines()), 4)
+    
+    async def test_unknown_format_redirects(self):
+        response = await self.async_client.get('/export/', {'keyword': 'EOS R5', 'format': 'xlsx'})
+        self.assertEqual(response.status_code, 302)
+    
+    def test_parquet_link_is_shown_only_when_available(self):
+        for available in (True, False):
+            with mock.patch('myapp.exports.is_available', return_value=available):
+                response = self.client.get('/camera-search/')
+            self.assertEqual('data-format="parquet"' in response.content.decode(), available)
+
+
+class MetricsTests(SearchTestCase):
+    """計測と /metrics のテスト"""
+    
+    def setUp(self):
+        super().setUp()
+        for metric in metrics._registry:
+            metric.clear()
+    
+    def test_text_exposition_format(self):
+        histogram = metrics.Histogram('test_seconds', 'Test latency', ['source'], buckets=(0.1, 1), register=False)
+        histogram.labels('Kita"mura').observe(0.05)
+        histogram.labels('Kita"mura').observe(0.5)
+        counter = metrics.Counter('test_total', 'Test counter', register=False)
+        counter.inc(3)
+        
+        self.assertEqual(histogram.collect(), [
+            '# HELP test_seconds Test latency',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{source="Kita\\"mura",le="0.1"} 1',
+            'test_seconds_bucket{source="Kita\\"mura",le="1"} 2',
+            'test_seconds_bucket{source="Kita\\"mura",le="+Inf"} 2',
+            'test_seconds_sum{source="Kita\\"mura"} 0.55',
+            'test_seconds_count{source="Kita\\"mura"} 2',
+        ])
+        self.assertEqual(counter.collect()[-1], 'test_total 3')
+    
+    async def test_pipeline_is_instrumented(self):
+        with mock.patch('myapp.utils.get_all_scrapers', side_effect=fake_scrapers(latency=0)):
+            await search_all_sites('EOS R5')
+            await search_all_sites('EOS R5')
+        
+        scraper = KitamuraScraper()
+        scraper.max_pages = 1
+        with override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'}), \
+                mock.patch.object(scraper, 'fetch', return_value=FetchResult(200, KITAMURA_PAGE)):
+            await scraper.search('eos')
+        
+        response = await self.async_client.get('/metrics')
+        body = response.content.decode()
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('search_cache_requests_total{tier="memory",result="hit"} 2', body)
+        self.assertIn('search_cache_requests_total{tier="db",result="miss"} 2', body)
+        self.assertIn('search_seconds_count 2', body)
+        self.assertIn('scraper_items_per_page_sum{source="KitamuraScraper"} 2', body)
+        self.assertIn('scraper_parse_seconds_count{source="KitamuraScraper"} 1', body)
+    
+    async def test_stale_memory_recheck_is_counted_once(self):
+        # FakeA はデータベース層が応答し、FakeB はデータベース層に行がなくメモリ層の値を返す
+        now = timezone.now()
+        for source in ('FakeA', 'FakeB'):
+            memory_cache.set(('eos r5', source), ([ProductResult('old')], now - timedelta(minutes=1),
+                                                  now + timedelta(hours=1)))
+        await sync_to_async(SearchCache.create_cache)('eos r5', 'FakeA', [{'title': 'refreshed', 'price': 1}])
+        
+        found = await aget_cached_results('eos r5', ['FakeA', 'FakeB'])
+        
+        self.assertEqual(found['FakeA'][1], SearchCache.FRESH)
+        self.assertEqual(found['FakeB'][1], SearchCache.STALE)
+        self.assertEqual(metrics.CACHE_REQUESTS.collect()[2:], [
+            'search_cache_requests_total{tier="db",result="hit"} 1',
+            'search_cache_requests_total{tier="memory",result="stale"} 1',
+        ])
+
+
+class SiteSpecTests(SearchTestCase):
+    """宣言的なサイト定義のテスト"""
+    
+    def example_spec(self, **overrides):
+        spec = SiteSpec(
+            name='ExampleScraper',
+            label='Example',
+            base_url='https://example.com/',
+            search_url_template='https://example.com/search?q={keyword}',
+            item_selector='ul.results li',
+            fields={
+                'title': FieldSpec('h2'),
+                'price': FieldSpec('.price', PRICE),
+                'product_url': FieldSpec('a', URL, 'href'),
+            },
+        )
+        return spec._replace(**overrides)
+    
+    def test_new_store_is_a_spec(self):
+        scraper = build_scraper_class(self.example_spec(), __name__)()
+        scraper.parser_backend = LXML
+        html = ('<ul class="results"><li><a href="/p/1"><h2> Leica M6 </h2></a><b class="price">¥250,000</b></li>'
+                '<li><h2>Leica M3</h2></li></ul>')
+        items, _ = scraper.extract(html)
+        
+        self.assertEqual(scraper.name, 'ExampleScraper')
+        self.assertEqual(items, [
+            ProductResult('Leica M6', 250000, product_url='https://example.com/p/1', source='ExampleScraper'),
+            ProductResult('Leica M3', 0, source='ExampleScraper'),
+        ])
+    
+    def test_invalid_spec_fails_at_build(self):
+        with self.assertRaises(ValueError):
+            build_scraper_class(self.example_spec(fields={'url': FieldSpec('a', URL)}), __name__)
+    
+    def test_compiled_selectors_match_soupsieve(self):
+        soup = parse_document(KITAMURA_PAGE, LXML)
+        selectors = {spec.item_selector for spec in SITE_SPECS}
+        selectors |= {field.selector for spec in SITE_SPECS for field in spec.fields.values()}
+        for selector in selectors | {'div > .product-title', 'a[href]'}:
+            with self.subTest(selector=selector):
+                self.assertEqual(CompiledSelector(selector).select(soup), soup.select(selector))
+    
+    def test_generated_scrapers_pickle_by_name(self):
+        scraper = pickle.loads(pickle.dumps(KitamuraScraper()))
+        self.assertIs(type(scraper), KitamuraScraper)
+        self.assertEqual(scraper.search_url_template, SITE_SPECS[1].search_url_template)
+
+
+class ParseExecutorTests(SearchTestCase):
+    """パース用エグゼキュータのテスト"""
+    
+    def setUp(self):
+        super().setUp()
+        executor.shutdown_executor()
+        self.addCleanup(executor.shutdown_executor)
+    
+    def test_falls_back_to_threads_without_process_pool(self):
+        with mock.patch('myapp.scrapers.executor.ProcessPoolExecutor', side_effect=OSError('no semaphores')):
+            self.assertIsInstance(executor.get_executor(), ThreadPoolExecutor)
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'process', 'MAX_WORKERS': 1})
+    async def test_process_pool_runs_outside_event_loop_process(self):
+        self.assertNotEqual(await executor.run_in_parse_executor(os.getpid), os.getpid())
+    
+    @override_settings(SCRAPER_PARSE_EXECUTOR={'KIND': 'inline'})
+    async def test_inline_runs_on_event_loop(self):
+        self.assertEqual(await executor.run_in_parse_executor(os.getpid), os.getpid())
@@ -19,6 +19,11 @@ urlpatterns = [
     # カメラ検索関連のパス
     path('camera-search/', views.camera_search, name='camera_search'),
     path('api/search/', views.search_api, name='search_api'),
+    path('api/search/batch/', views.search_batch, name='search_batch'),
+    path('api/search/table/', views.search_table, name='search_table'),
+    path('api/search/stream/', views.search_stream, name='search_stream'),
     path('search-results-html/', views.search_results_html, name='search_results_html'),
     path('export-csv/', views.export_search_results, name='export_csv'),
+    path('export/', views.export_search_results, name='export_results'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
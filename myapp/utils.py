@@ -2,15 +2,38 @@
 ユーティリティ関数
 """
 import asyncio
-import csv
-from io import StringIO
-from typing import List, Dict, Any, Optional
+import logging
+from itertools import chain
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Set, Tuple
 from asgiref.sync import sync_to_async
+from django.conf import settings
 
-from .scrapers.champcamera import ChampCameraScraper
-from .scrapers.kitamura import KitamuraScraper
-from .scrapers.jcamera import JCameraScraper
-from .models import SearchCache
+from .scrapers.sites import SCRAPER_CLASSES
+from . import metrics
+from .models import Product, SearchCache, SearchKeyword
+from .cache import aget_cached_results, aget_cached_results_many, remember
+from .scrapers.result import ProductResult, by_price
+from .keywords import canonicalize_keyword, normalize_keyword
+
+logger = logging.getLogger(__name__)
+
+# 締め切りまでに検索が終わらなかったサイトの鮮度
+TIMEOUT = 'timeout'
+
+# 検索全体の締め切り後、各サイトの打ち切り処理を待つ猶予（秒）
+DEADLINE_GRACE = 0.25
+
+# settings.SEARCH_BATCH で上書き可能なデフォルト値
+DEFAULT_BATCH_CONFIG = {
+    'MAX_KEYWORDS': 500,  # 1回の一括検索で受け付けるキーワード数の上限
+    'CONCURRENCY': 4,     # 同時に検索するキーワード数
+}
+
+# 実行中のスクレイピング（(キーワードの正規形, ソース名) -> Task）
+_inflight: Dict[tuple, asyncio.Task] = {}
+
+# 実行中のバックグラウンド再取得タスク
+_background_tasks: Set[asyncio.Task] = set()
 
 def get_all_scrapers():
     """
@@ -19,121 +42,383 @@ def get_all_scrapers():
     Returns:
         List[BaseScraper]: スクレイパーインスタンスのリスト
     """
-    return [
-        ChampCameraScraper(),
-        KitamuraScraper(),
-        JCameraScraper(),
-    ]
+    return [scraper_class() for scraper_class in SCRAPER_CLASSES.values()]
 
-async def search_all_sites(keyword: str, use_cache: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+def get_source_names() -> List[str]:
+    """
+    利用可能な全スクレイパーのソース名を取得
+    
+    Returns:
+        List[str]: ソース名のリスト（検索結果のマージ順）
+    """
+    return [scraper.name for scraper in get_all_scrapers()]
+
+async def search_all_sites(keyword: str, use_cache: bool = True,
+                           meta: Optional[Dict[str, Any]] = None,
+                           deadline: Optional[float] = None,
+                           sources: Optional[Iterable[str]] = None,
+                           caches: Optional[Dict[str, Tuple[List[ProductResult], str]]] = None,
+                           record: bool = True,
+                           ) -> Dict[str, List[ProductResult]]:
     """
     全サイトで検索を実行
     
+    再検証期限内の期限切れキャッシュ（stale）はそのまま返し、
+    バックグラウンドで再取得する。
+    
     Args:
         keyword (str): 検索キーワード
         use_cache (bool, optional): キャッシュを使用するかどうか。デフォルトはTrue。
+        meta (Dict[str, Any], optional): 指定時、サイト毎の鮮度を 'freshness' に
+            （'fresh' / 'stale' / 'live' / 'timeout'）、締め切りに間に合わなかった
+            サイト名のリストを 'timed_out' に書き込む
+        deadline (float, optional): 検索全体の締め切り（秒）。未指定時はサイト毎の設定のみ
+        sources (Iterable[str], optional): 検索するサイト名（未指定時は全サイト）
+        caches (Dict, optional): 取得済みのキャッシュ（iter_search_all_sites を参照）
+        record (bool, optional): 検索回数（人気キーワードの集計）に記録するかどうか。デフォルトはTrue。
         
     Returns:
-        Dict[str, List[Dict[str, Any]]]: サイト名をキーとした検索結果辞書
+        Dict[str, List[ProductResult]]: サイト名をキーとした検索結果辞書
     """
-    scrapers = get_all_scrapers()
-    tasks = []
     results = {}
+    freshness = {}
     
-    for scraper in scrapers:
-        if use_cache:
-            # キャッシュ確認 - 非同期対応
-            cache = await get_valid_cache_async(keyword, scraper.name)
-            if cache:
-                results[scraper.name] = cache
-                continue
-                
-        # キャッシュがない場合は検索タスクを追加
-        tasks.append(_search_with_scraper(scraper, keyword, use_cache))
+    async for name, site_results, site_freshness in iter_search_all_sites(keyword, use_cache, deadline,
+                                                                          sources, caches, record):
+        results[name] = site_results
+        freshness[name] = site_freshness
     
-    # 非同期で全てのタスクを実行
-    if tasks:
-        site_results = await asyncio.gather(*tasks)
-        # 結果をマージ
-        for name, site_result in site_results:
-            results[name] = site_result
+    if meta is not None:
+        meta['freshness'] = freshness
+        meta['timed_out'] = [name for name, value in freshness.items() if value == TIMEOUT]
     
     return results
 
-async def _search_with_scraper(scraper, keyword: str, save_cache: bool = True) -> tuple:
+async def iter_search_all_sites(keyword: str, use_cache: bool = True,
+                                deadline: Optional[float] = None,
+                                sources: Optional[Iterable[str]] = None,
+                                caches: Optional[Dict[str, Tuple[List[ProductResult], str]]] = None,
+                                record: bool = True,
+                                ) -> AsyncIterator[Tuple[str, List[ProductResult], str]]:
     """
-    単一のスクレイパーで検索を実行しキャッシュを更新
+    全サイトで検索を実行し、サイト毎の結果を完了した順に返す
+    
+    キャッシュ済みのサイトを先に返し、残りはスクレイピングが終わり次第返す。
+    締め切りを過ぎたサイトは、それまでに取得できた結果（部分結果）を鮮度 'timeout' で返す。
+    呼び出し側が途中で反復をやめた場合、待機中のタスクは破棄する
+    （実行中のスクレイピング自体はサイト毎の締め切りまで継続し、結果はキャッシュされる）。
     
     Args:
-        scraper: スクレイパーインスタンス
         keyword (str): 検索キーワード
-        save_cache (bool, optional): 結果をキャッシュするかどうか。デフォルトはTrue。
+        use_cache (bool, optional): キャッシュを使用するかどうか。デフォルトはTrue。
+        deadline (float, optional): 検索全体の締め切り（秒）。未指定時はサイト毎の設定のみ
+        sources (Iterable[str], optional): 検索するサイト名（未指定時は全サイト）
+        caches (Dict, optional): aget_cached_results_many で取得済みのこのキーワードのキャッシュ
+            （ソース名 -> (検索結果リスト, 鮮度)）。指定時はキャッシュを問い合わせない
+        record (bool, optional): 検索回数（人気キーワードの集計）に記録するかどうか。デフォルトはTrue。
+        
+    Yields:
+        Tuple[str, List[ProductResult], str]: (サイト名, 検索結果リスト, 鮮度)
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline_at = None if deadline is None else started + deadline
+    
+    # サイトへの検索クエリは正規化済みキーワード、キャッシュキーは正規形を使う
+    query = normalize_keyword(keyword)
+    cache_key = canonicalize_keyword(keyword)
+    
+    # 人気キーワードの事前取得用に検索回数を記録（応答は待たせない）
+    if record:
+        _run_in_background(record_search_async(cache_key, query))
+    
+    scrapers = get_all_scrapers()
+    if sources is not None:
+        sources = set(sources)
+        scrapers = [scraper for scraper in scrapers if scraper.name in sources]
+    tasks = {}
+    cached = []
+    
+    # 全サイト分のキャッシュをメモリ層→データベース層（1クエリ）の順に確認
+    if not use_cache:
+        caches = {}
+    elif caches is None:
+        caches = await aget_cached_results(cache_key, [scraper.name for scraper in scrapers])
+    
+    for scraper in scrapers:
+        if scraper.name in caches:
+            cached_results, cache_freshness = caches[scraper.name]
+            cached.append((scraper.name, cached_results, cache_freshness))
+            if cache_freshness == SearchCache.STALE:
+                _schedule_refresh(scraper, query, cache_key)
+            continue
+                
+        # キャッシュがない場合は検索タスクを開始
+        timeout = get_source_deadline(scraper.name, None if deadline_at is None else deadline_at - loop.time())
+        task = asyncio.ensure_future(_search_single_flight(scraper, query, cache_key, use_cache, timeout))
+        tasks[task] = scraper.name
+    
+    pending = set(tasks)
+    try:
+        for item in cached:
+            yield item
         
+        # 完了したサイトから順に返す
+        # 締め切り後も打ち切り処理（部分結果の確定）の分だけ猶予を置く
+        while pending:
+            remaining = None if deadline_at is None else deadline_at + DEADLINE_GRACE - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name, site_result, complete = task.result()
+                yield name, site_result, 'live' if complete else TIMEOUT
+        
+        # 検索全体の締め切りまでに終わらなかったサイト
+        for task in pending:
+            yield tasks[task], [], TIMEOUT
+    finally:
+        for task in tasks:
+            task.cancel()
+        metrics.SEARCH_SECONDS.observe(loop.time() - started)
+
+def get_batch_config() -> Dict[str, Any]:
+    """
+    一括検索の設定を取得
+    
     Returns:
-        tuple: (スクレイパー名, 検索結果リスト)
+        Dict[str, Any]: デフォルト値に settings.SEARCH_BATCH の値をマージした設定
+    """
+    config = dict(DEFAULT_BATCH_CONFIG)
+    config.update(getattr(settings, 'SEARCH_BATCH', {}))
+    return config
+
+async def iter_search_batch(keywords: Iterable[str], sources: Optional[Iterable[str]] = None,
+                            deadline: Optional[float] = None, record: bool = False,
+                            ) -> AsyncIterator[Tuple[str, Dict[str, List[ProductResult]], Dict[str, Any]]]:
     """
-    results = await scraper.search(keyword)
+    複数キーワードで検索を実行し、キーワード毎の結果を完了した順に返す
     
-    if save_cache and results:
-        # 検索結果をキャッシュ - 非同期対応
-        await create_cache_async(keyword, scraper.name, results)
+    全キーワード分のキャッシュを最初にまとめて取得し（データベースへは1クエリ）、
+    全サイトのキャッシュがあるキーワードは検索中のキーワードを待たずに先に返す。
+    キャッシュがないサイトのみ CONCURRENCY 件ずつ検索する。同じイベントループ上で実行するため、
+    HTTPセッション（接続）・ホスト毎のレート制限・実行中の検索への相乗りは一括検索全体で共有される。
+    正規形が同じキーワードは最初のものだけを検索する。
+    
+    Args:
+        keywords (Iterable[str]): 検索キーワード
+        sources (Iterable[str], optional): 検索するサイト名（未指定時は全サイト）
+        deadline (float, optional): キーワード毎の検索の締め切り（秒）
+        record (bool, optional): 検索回数（人気キーワードの集計）に記録するかどうか。
+            一括検索は利用者の検索ではないため、デフォルトは記録しない
+        
+    Yields:
+        Tuple[str, Dict[str, List[ProductResult]], Dict[str, Any]]:
+            (キーワード, サイト名をキーとした検索結果辞書, search_all_sites の meta)
+    """
+    unique = {}
+    for keyword in keywords:
+        unique.setdefault(canonicalize_keyword(keyword), keyword)
+    
+    names = get_source_names()
+    if sources is not None:
+        sources = set(sources)
+        names = [name for name in names if name in sources]
+    caches = await aget_cached_results_many(unique, names)
     
-    return (scraper.name, results)
+    semaphore = asyncio.Semaphore(get_batch_config()['CONCURRENCY'])
+    
+    async def search(cache_key, keyword):
+        meta = {}
+        results = await search_all_sites(keyword, meta=meta, deadline=deadline, sources=names,
+                                         caches=caches[cache_key], record=record)
+        return keyword, results, meta
+    
+    async def search_limited(cache_key, keyword):
+        async with semaphore:
+            return await search(cache_key, keyword)
+    
+    cached = []
+    tasks = []
+    for cache_key, keyword in unique.items():
+        if caches[cache_key].keys() >= set(names):
+            cached.append((cache_key, keyword))
+        else:
+            tasks.append(asyncio.ensure_future(search_limited(cache_key, keyword)))
+    
+    try:
+        # 全サイトのキャッシュがあるキーワードは同時実行数の枠を使わずにすぐ返す
+        for cache_key, keyword in cached:
+            yield await search(cache_key, keyword)
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
 
-def merge_search_results(results_dict: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+def get_source_deadline(source: str, deadline: Optional[float] = None) -> Optional[float]:
     """
-    サイト別の検索結果を1つのリストにマージ
+    サイト毎のスクレイピング締め切り（秒）を取得
+    settings.SEARCH_DEADLINES のソース別設定（なければ 'default'）と
+    検索全体の残り時間のうち短い方を返す
     
     Args:
-        results_dict (Dict[str, List[Dict[str, Any]]]): サイト名をキーとした検索結果辞書
+        source (str): ソース名
+        deadline (float, optional): 検索全体の残り時間（秒）
         
     Returns:
-        List[Dict[str, Any]]: マージされた検索結果リスト
+        Optional[float]: 締め切り（秒）、いずれも未設定の場合はNone
     """
-    merged_results = []
-    
-    for site_name, site_results in results_dict.items():
-        merged_results.extend(site_results)
+    deadlines = getattr(settings, 'SEARCH_DEADLINES', {})
+    candidates = [value for value in (deadlines.get(source, deadlines.get('default')), deadline) if value is not None]
+    return max(min(candidates), 0) if candidates else None
+
+async def refresh_site_cache(scraper, query: str, cache_key: str) -> List[ProductResult]:
+    """
+    1サイトのキャッシュを再取得
+    利用者の検索と同じ相乗り・サイト毎の締め切り・キャッシュ保存の経路で取得する
     
-    return merged_results
+    Args:
+        scraper: スクレイパーインスタンス
+        query (str): サイトへの検索クエリ（正規化済みキーワード）
+        cache_key (str): キャッシュキー（キーワードの正規形）
+        
+    Returns:
+        List[ProductResult]: 検索結果リスト（締め切りで打ち切られた場合は部分結果）
+    """
+    _, results, _ = await _search_single_flight(scraper, query, cache_key, True, get_source_deadline(scraper.name))
+    return results
 
-# 非同期対応キャッシュ関数
-@sync_to_async
-def get_valid_cache_async(keyword, source):
-    """非同期キャッシュ取得"""
-    cache = SearchCache.get_valid_cache(keyword, source)
-    if cache:
-        return cache.results
-    return None
+def _schedule_refresh(scraper, query: str, cache_key: str) -> None:
+    """
+    期限切れキャッシュの再取得をバックグラウンドで開始
+    同時に複数の要求があっても相乗りにより取得は1回になる
+    
+    Args:
+        scraper: スクレイパーインスタンス
+        query (str): 正規化済み検索キーワード
+        cache_key (str): キャッシュキー（キーワードの正規形）
+    """
+    _run_in_background(refresh_site_cache(scraper, query, cache_key))
 
-@sync_to_async
-def create_cache_async(keyword, source, results):
-    """非同期キャッシュ作成"""
-    return SearchCache.create_cache(keyword, source, results)
+def _run_in_background(coro) -> asyncio.Future:
+    """コルーチンをバックグラウンドで実行（タスクがGCされないよう完了まで参照を保持）"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
+async def _search_single_flight(scraper, query: str, cache_key: str, save_cache: bool = True,
+                                timeout: Optional[float] = None) -> tuple:
+    """
+    同一キーワード・同一サイトの実行中スクレイピングに相乗りする
+    
+    最初の呼び出しだけが実際にスクレイピングを行い、同時に到着した
+    他の呼び出しはその結果を待つ（締め切りも最初の呼び出しのものが適用される）。
+    
+    Args:
+        scraper: スクレイパーインスタンス
+        query (str): 正規化済み検索キーワード
+        cache_key (str): キャッシュキー（キーワードの正規形）
+        save_cache (bool, optional): 結果をキャッシュするかどうか。デフォルトはTrue。
+        timeout (float, optional): スクレイピングの締め切り（秒）
+        
+    Returns:
+        tuple: (スクレイパー名, 検索結果リスト, 締め切り内に完了したかどうか)
+    """
+    key = (cache_key, scraper.name)
+    task = _inflight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_search_with_scraper(scraper, query, cache_key, save_cache, timeout))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+    # 待機側がキャンセルされても共有タスクは継続させる
+    return await asyncio.shield(task)
 
-def export_to_csv(results: List[Dict[str, Any]]) -> str:
+async def _search_with_scraper(scraper, query: str, cache_key: str, save_cache: bool = True,
+                               timeout: Optional[float] = None) -> tuple:
     """
-    検索結果をCSV形式に変換
+    単一のスクレイパーで検索を実行しキャッシュを更新
+    締め切りを過ぎた場合はスクレイピングを中止し、それまでの部分結果を短い有効期間でキャッシュする
     
     Args:
-        results (List[Dict[str, Any]]): 検索結果リスト
+        scraper: スクレイパーインスタンス
+        query (str): 正規化済み検索キーワード
+        cache_key (str): キャッシュキー（キーワードの正規形）
+        save_cache (bool, optional): 結果をキャッシュするかどうか。デフォルトはTrue。
+        timeout (float, optional): スクレイピングの締め切り（秒）
         
     Returns:
-        str: CSV形式の文字列
+        tuple: (スクレイパー名, 検索結果リスト, 締め切り内に完了したかどうか)
     """
-    if not results:
-        return ""
+    complete = True
+    try:
+        results = await asyncio.wait_for(scraper.search(query), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{scraper.name} did not finish within {timeout}s for '{query}'")
+        results = list(scraper.partial_results)
+        complete = False
     
-    output = StringIO()
-    fieldnames = ['title', 'price', 'condition', 'source', 'product_url', 'image_url']
+    if save_cache and results:
+        # 検索結果をキャッシュ - 非同期対応（部分結果は短い有効期間）
+        cache_duration = None if complete else SearchCache.get_partial_ttl(scraper.name)
+        await create_cache_async(cache_key, scraper.name, results, cache_duration)
+    
+    if results:
+        # 商品索引を更新（ローカル検索用。失敗しても検索結果は返す）
+        try:
+            await Product.aupsert_results(scraper.name, results)
+        except Exception:
+            logger.exception(f"Failed to update product index for {scraper.name}")
     
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
+    return (scraper.name, results, complete)
+
+async def local_search(keyword: str, limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    商品索引（Productテーブル）のみでキーワード検索（店舗サイトにはアクセスしない）
     
-    for result in results:
-        # 必要なフィールドのみ抽出
-        row = {field: result.get(field, '') for field in fieldnames}
-        writer.writerow(row)
+    Args:
+        keyword (str): 検索キーワード
+        limit (int, optional): 最大件数（デフォルトは Product.SEARCH_LIMIT）
+        
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: サイト名をキーとした検索結果辞書（search_all_sites と同じ形式）
+    """
+    sources = get_source_names()
+    results = {source: [] for source in sources}
+    for product in await Product.asearch(normalize_keyword(keyword), sources, limit):
+        results[product['source']].append(product)
+    return results
+
+def merge_search_results(results_dict: Dict[str, List[ProductResult]],
+                         sort_by_price: bool = False) -> List[ProductResult]:
+    """
+    サイト別の検索結果を1つのリストにマージ（レコードはコピーしない）
     
-    return output.getvalue()
+    Args:
+        results_dict (Dict[str, List[ProductResult]]): サイト名をキーとした検索結果辞書
+        sort_by_price (bool, optional): 価格順に並べるかどうか（マージと同時に1回で並べ替える）
+        
+    Returns:
+        List[ProductResult]: マージされた検索結果リスト
+    """
+    merged_results = chain.from_iterable(results_dict.values())
+    if sort_by_price:
+        return sorted(merged_results, key=by_price)
+    return list(merged_results)
+
+# 非同期対応キャッシュ関数
+@sync_to_async
+def record_search_async(keyword, query=''):
+    """非同期で検索回数を記録（失敗しても検索には影響させない）"""
+    try:
+        SearchKeyword.record(keyword, query)
+    except Exception:
+        logger.exception(f"Failed to record search for '{keyword}'")
+
+@sync_to_async
+def create_cache_async(keyword, source, results, cache_duration=None):
+    """非同期キャッシュ作成（メモリ層にも書き込む）"""
+    cache = SearchCache.create_cache(keyword, source, results, cache_duration)
+    remember(cache)
+    return cache
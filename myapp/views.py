@@ -1,14 +1,24 @@
-import asyncio
 import json
+import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.utils.http import content_disposition_header
 
+from . import exports, metrics
+from .datatables import get_result_table, parse_request, table_cache
+from .keywords import canonicalize_keyword
+from .scrapers.result import ResultJSONEncoder, by_price
 from .models import Category, Task, SearchCache
-from .utils import search_all_sites, merge_search_results, export_to_csv
+from .utils import (
+    TIMEOUT, search_all_sites, iter_search_all_sites, iter_search_batch, local_search, merge_search_results,
+    get_batch_config, get_source_names,
+)
+
+logger = logging.getLogger(__name__)
 
 def task_list(request):
     tasks = Task.objects.all().order_by('-created_at')
@@ -92,10 +102,12 @@ def item_list(request):
 
 def camera_search(request):
     """カメラ検索ページを表示"""
-    return render(request, 'myapp/camera_search.html')
+    return render(request, 'myapp/camera_search.html', {
+        'parquet_available': exports.is_available(exports.PARQUET),
+    })
 
 @csrf_exempt
-def search_api(request):
+async def search_api(request):
     """検索APIエンドポイント"""
     if request.method != 'POST':
         return JsonResponse({'error': '不正なリクエストメソッド'}, status=405)
@@ -103,96 +115,290 @@ def search_api(request):
     # POSTリクエストからキーワードを取得
     try:
         data = json.loads(request.body)
-        keyword = data.get('keyword', '')
     except json.JSONDecodeError:
-        keyword = request.POST.get('keyword', '')
+        data = request.POST
+    keyword = data.get('keyword', '')
+    deadline = _parse_deadline(data.get('deadline'))
     
     if not keyword:
         return JsonResponse({'error': 'キーワードが指定されていません'}, status=400)
     
-    # 非同期で全サイト検索を実行
+    # mode=local の場合は店舗サイトにアクセスせず商品索引のみを検索する
+    local = data.get('mode') == 'local'
+    
+    # 全サイト検索を実行（ASGIのイベントループ上で並行処理される）
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            results_dict = loop.run_until_complete(search_all_sites(keyword))
-        finally:
-            loop.close()
-        
-        # 結果をマージ
-        merged_results = merge_search_results(results_dict)
+        if local:
+            results_dict = await local_search(keyword)
+            meta = {'freshness': {source: 'local' for source in results_dict}, 'timed_out': []}
+        else:
+            meta = {}
+            results_dict = await search_all_sites(keyword, meta=meta, deadline=deadline)
         
-        # 価格でソート
-        sorted_results = sorted(merged_results, key=lambda x: x.get('price', 0))
+        # 結果をマージし価格でソート
+        sorted_results = merge_search_results(results_dict, sort_by_price=True)
         
-        # 結果を返す
+        # 結果を返す（ProductResult はJSON化の時点で辞書に変換される）
         return JsonResponse({
             'keyword': keyword,
             'count': len(sorted_results),
             'results': sorted_results,
-        })
+            'freshness': meta['freshness'],
+            'timed_out': meta['timed_out'],
+        }, encoder=ResultJSONEncoder)
     except Exception as e:
         import traceback
         error_traceback = traceback.format_exc()
-        print(f"Error in search_api: {str(e)}\n{error_traceback}")
+        logger.exception(f"Error in search_api: {e}")
         return JsonResponse({
             'error': f'検索時にエラーが発生しました: {str(e)}',
             'details': error_traceback if settings.DEBUG else ''
         }, status=500)
 
-def search_results_html(request):
-    """検索結果を部分HTMLとして返す（Ajax用）"""
+@csrf_exempt
+async def search_batch(request):
+    """
+    複数キーワードの一括検索APIエンドポイント
+    
+    リクエスト: {"keywords": [...], "sources": [...]（省略可）, "deadline": 秒（省略可）}
+    キーワード毎の検索が終わり次第 {"type": "keyword", ...} をNDJSONで1行ずつ送り、
+    最後に {"type": "summary", ...} を送る
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': '不正なリクエストメソッド'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSONで指定してください'}, status=400)
+    
+    keywords = data.get('keywords') if isinstance(data, dict) else None
+    if not isinstance(keywords, list) or not keywords:
+        return JsonResponse({'error': 'キーワードが指定されていません'}, status=400)
+    keywords = [keyword.strip() for keyword in keywords if isinstance(keyword, str) and keyword.strip()]
+    max_keywords = get_batch_config()['MAX_KEYWORDS']
+    if not keywords or len(keywords) > max_keywords:
+        return JsonResponse({'error': f'キーワードは1〜{max_keywords}件で指定してください'}, status=400)
+    
+    sources = data.get('sources')
+    if sources is not None:
+        known = set(get_source_names())
+        if (not isinstance(sources, list) or not sources
+                or not all(isinstance(source, str) for source in sources) or not set(sources) <= known):
+            return JsonResponse({'error': f'sources には {", ".join(sorted(known))} を指定してください'}, status=400)
+    
+    response = StreamingHttpResponse(_stream_batch_records(keywords, sources, _parse_deadline(data.get('deadline'))),
+                                     content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def _stream_batch_records(keywords, sources=None, deadline=None):
+    """キーワード毎の検索結果をNDJSONの行として順次生成"""
+    completed = 0
+    try:
+        async for keyword, results_dict, meta in iter_search_batch(keywords, sources, deadline):
+            sorted_results = merge_search_results(results_dict, sort_by_price=True)
+            completed += 1
+            yield _ndjson_line({
+                'type': 'keyword',
+                'keyword': keyword,
+                'count': len(sorted_results),
+                'results': sorted_results,
+                'freshness': meta['freshness'],
+                'timed_out': meta['timed_out'],
+            })
+    except Exception as e:
+        logger.exception(f"Error in search_batch: {e}")
+        yield _ndjson_line({'type': 'error', 'error': f'検索時にエラーが発生しました: {str(e)}'})
+    
+    yield _ndjson_line({'type': 'summary', 'count': completed})
+
+async def search_table(request):
+    """
+    検索結果テーブルのAPIエンドポイント（DataTables の server-side processing 形式）
+    
+    キャッシュ済みの結果を並び順の索引付きで保持し、絞り込み・並べ替え後の
+    1ページ分の行のみを返す。
+    検索（キャッシュがないサイトのスクレイピングと検索回数の記録）は初回の描画（draw=1）と
+    テーブルが保持されていない場合のみ行い、ページ送り・並べ替え・絞り込みの描画は保持済みのテーブルから返す
+    """
     keyword = request.GET.get('keyword', '')
     if not keyword:
-        return HttpResponse('キーワードが指定されていません')
+        return JsonResponse({'error': 'キーワードが指定されていません'}, status=400)
+    
+    cache_key = canonicalize_keyword(keyword)
+    draw = _parse_draw(request.GET.get('draw'))
+    table = table_cache.get(cache_key) if draw > 1 else None
+    if table is None:
+        meta = {}
+        results_dict = await search_all_sites(keyword, meta=meta,
+                                              deadline=_parse_deadline(request.GET.get('deadline')))
+        table = get_result_table(cache_key, results_dict, meta)
+    page = table.query(**parse_request(request.GET))
     
-    # 非同期で全サイト検索を実行
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': page['total'],
+        'recordsFiltered': page['filtered'],
+        'data': page['rows'],
+        'freshness': table.meta.get('freshness', {}),
+        'timed_out': table.meta.get('timed_out', []),
+    }, encoder=ResultJSONEncoder)
+
+def _parse_draw(value):
+    """DataTables の描画番号（応答順の判定用）を解釈。不正な値の場合は0"""
     try:
-        results_dict = loop.run_until_complete(search_all_sites(keyword))
-    finally:
-        loop.close()
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+async def search_stream(request):
+    """
+    検索結果をサイト毎にNDJSONでストリーミング返却するAPIエンドポイント
     
-    # 結果をマージ
-    merged_results = merge_search_results(results_dict)
+    各サイトの検索が終わり次第 {"type": "site", ...} を1行ずつ送り、
+    最後に {"type": "summary", ...} を送る
+    """
+    keyword = request.GET.get('keyword', '')
+    if not keyword:
+        return JsonResponse({'error': 'キーワードが指定されていません'}, status=400)
     
-    # 価格でソート
-    sorted_results = sorted(merged_results, key=lambda x: x.get('price', 0))
+    deadline = _parse_deadline(request.GET.get('deadline'))
+    response = StreamingHttpResponse(_stream_search_records(keyword, deadline), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # リバースプロキシでのバッファリングを無効化
+    return response
+
+async def _stream_search_records(keyword, deadline=None):
+    """サイト毎の検索結果をNDJSONの行として順次生成"""
+    total = 0
+    freshness = {}
+    try:
+        async for name, site_results, site_freshness in iter_search_all_sites(keyword, deadline=deadline):
+            sorted_results = sorted(site_results, key=by_price)
+            total += len(sorted_results)
+            freshness[name] = site_freshness
+            yield _ndjson_line({
+                'type': 'site',
+                'source': name,
+                'freshness': site_freshness,
+                'count': len(sorted_results),
+                'results': sorted_results,
+            })
+    except Exception as e:
+        logger.exception(f"Error in search_stream: {e}")
+        yield _ndjson_line({'type': 'error', 'error': f'検索時にエラーが発生しました: {str(e)}'})
+    
+    yield _ndjson_line({
+        'type': 'summary',
+        'keyword': keyword,
+        'count': total,
+        'freshness': freshness,
+        'timed_out': [name for name, value in freshness.items() if value == TIMEOUT],
+    })
+
+def _parse_deadline(value):
+    """リクエストで指定された締め切り（秒）を解釈。未指定・不正な値の場合はNone"""
+    try:
+        deadline = float(value)
+    except (TypeError, ValueError):
+        return None
+    return deadline if deadline > 0 else None
+
+def _ndjson_line(record):
+    """レコードをNDJSONの1行に変換"""
+    return json.dumps(record, ensure_ascii=False, cls=ResultJSONEncoder) + '\n'
+
+async def search_results_html(request):
+    """
+    検索結果を部分HTMLとして返す（Ajax用）
+    stream=1 の場合はサイト毎の行ブロックを検索完了順にストリーミングする
+    """
+    keyword = request.GET.get('keyword', '')
+    if not keyword:
+        return HttpResponse('キーワードが指定されていません')
+    
+    deadline = _parse_deadline(request.GET.get('deadline'))
+    if request.GET.get('stream'):
+        return StreamingHttpResponse(_stream_search_results_html(keyword, deadline),
+                                     content_type='text/html; charset=utf-8')
+    
+    # 全サイト検索を実行
+    meta = {}
+    results_dict = await search_all_sites(keyword, meta=meta, deadline=deadline)
+    
+    # 結果をマージし価格でソート
+    sorted_results = merge_search_results(results_dict, sort_by_price=True)
     
     # テンプレートでレンダリング
     html = render_to_string('myapp/partials/search_results.html', {
         'results': sorted_results,
         'keyword': keyword,
+        'is_stale': SearchCache.STALE in meta['freshness'].values(),
+        'timed_out': meta['timed_out'],
     })
     
     return HttpResponse(html)
 
-def export_search_results(request):
-    """検索結果をCSVとしてエクスポート"""
+async def _stream_search_results_html(keyword, deadline=None):
+    """テーブル開始・サイト毎の行ブロック・件数の順に部分HTMLを生成"""
+    template = 'myapp/partials/search_results_stream.html'
+    count = 0
+    is_stale = False
+    timed_out = []
+    yield render_to_string(template, {'part': 'head'})
+    async for name, site_results, site_freshness in iter_search_all_sites(keyword, deadline=deadline):
+        count += len(site_results)
+        is_stale = is_stale or site_freshness == SearchCache.STALE
+        if site_freshness == TIMEOUT:
+            timed_out.append(name)
+        yield render_to_string(template, {
+            'part': 'site',
+            'source': name,
+            'freshness': site_freshness,
+            'results': sorted(site_results, key=by_price),
+        })
+    yield render_to_string(template, {
+        'part': 'tail',
+        'keyword': keyword,
+        'count': count,
+        'is_stale': is_stale,
+        'timed_out': timed_out,
+    })
+
+async def export_search_results(request):
+    """
+    検索結果をエクスポート（format: csv / jsonl / parquet、デフォルトはcsv）
+    キャッシュ済みのサイトはキャッシュの結果を使い、価格順に1行ずつストリーミングする
+    """
     keyword = request.GET.get('keyword', '')
     if not keyword:
         messages.error(request, 'キーワードが指定されていません')
         return redirect('camera_search')
     
-    # 非同期で全サイト検索を実行
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        results_dict = loop.run_until_complete(search_all_sites(keyword))
-    finally:
-        loop.close()
-    
-    # 結果をマージ
-    merged_results = merge_search_results(results_dict)
-    
-    # 価格でソート
-    sorted_results = sorted(merged_results, key=lambda x: x.get('price', 0))
+    export_format = request.GET.get('format', exports.CSV)
+    if not exports.is_available(export_format):
+        messages.error(request, f'エクスポート形式 {export_format} は利用できません')
+        return redirect('camera_search')
     
-    # CSVとしてエクスポート
-    csv_data = export_to_csv(sorted_results)
+    # 全サイト検索を実行（キャッシュがないサイトのみ検索する）
+    results_dict = await search_all_sites(keyword)
     
-    response = HttpResponse(csv_data, content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="camera_search_{keyword}.csv"'
+    # 価格順の索引を使い、結果をコピーせずに書き出す
+    table = get_result_table(canonicalize_keyword(keyword), results_dict)
+    content_type, extension = exports.EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(_aiter(exports.iter_export(export_format, table.iter_rows())),
+                                     content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, f'camera_search_{keyword}.{extension}')
     
     return response
+
+async def _aiter(iterable):
+    """同期イテレータを非同期イテレータとして返す（ASGIでのストリーミング用）"""
+    for chunk in iterable:
+        yield chunk
+
+def metrics_view(request):
+    """検索パイプラインの計測値（Prometheus のテキスト形式）"""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
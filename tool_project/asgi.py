@@ -13,4 +13,28 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tool_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """
+    lifespanイベントで共有HTTPセッション・パース用エグゼキュータを起動・終了し、
+    それ以外はDjangoに委譲するASGIアプリケーション
+    """
+    if scope['type'] != 'lifespan':
+        await django_application(scope, receive, send)
+        return
+
+    from myapp.scrapers import executor, session
+
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await session.startup()
+            executor.get_executor()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await session.shutdown()
+            executor.shutdown_executor()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -129,3 +129,83 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# スクレイパー共有HTTPセッション設定（myapp.scrapers.session）
+SCRAPER_HTTP_SESSION = {
+    'LIMIT': 100,             # 全体の同時接続数上限
+    'LIMIT_PER_HOST': 4,      # ホスト毎の同時接続数上限
+    'DNS_CACHE_TTL': 300,     # DNSキャッシュの保持時間（秒）
+    'KEEPALIVE_TIMEOUT': 30,  # アイドル接続の保持時間（秒）
+}
+
+# 検索結果ページのHTTPキャッシュ（myapp.scrapers.httpcache）
+# ETag / Last-Modified・本文のダイジェストが前回と同じ場合は抽出結果を再利用する
+SCRAPER_HTTP_CACHE = {
+    'MAX_ENTRIES': 512,  # 保持する最大ページ数
+    'TTL': 86400,        # エントリの保持時間（秒）
+}
+
+# ホスト毎のリクエストレート制限（myapp.scrapers.ratelimit）。ホスト名毎に上書き可能
+# RATE: 1秒あたりのリクエスト数（Noneの場合はスクレイパーの delay から算出）
+# BURST: 待機なしで連続して送れるリクエスト数
+SCRAPER_RATE_LIMIT = {
+    'default': {'RATE': None, 'BURST': 3},
+}
+
+# 検索キャッシュの有効期間（秒）。ソース名毎に上書き可能
+# SOFT: この期間内はそのまま返す / HARD: この期間内は期限切れでも返しつつ裏で再取得する
+# PARTIAL: 締め切りで打ち切られた部分結果の有効期間
+SEARCH_CACHE_TTL = {
+    'default': {'SOFT': 60 * 60, 'HARD': 24 * 60 * 60, 'PARTIAL': 5 * 60},
+}
+
+# サイト毎のスクレイピング締め切り（秒）。ソース名毎に上書き可能
+# 検索リクエストで締め切りが指定された場合は短い方が適用される
+SEARCH_DEADLINES = {
+    'default': 20,
+}
+
+# プロセス内の検索キャッシュ（SearchCacheテーブルの前段のLRUキャッシュ）
+SEARCH_MEMORY_CACHE = {
+    'MAX_ENTRIES': 1024,  # 最大エントリ数
+    'TTL': 60,            # 保持時間（秒）。他ワーカーでの更新はこの時間内に反映される
+}
+
+# 検索結果テーブル（/api/search/table/）の並び順の索引を保持するキャッシュ
+SEARCH_TABLE_CACHE = {
+    'MAX_ENTRIES': 64,  # 保持するキーワード数
+    'TTL': 60,          # 保持時間（秒）
+}
+
+# 複数キーワードの一括検索（/api/search/batch/）
+SEARCH_BATCH = {
+    'MAX_KEYWORDS': 500,  # 1回で受け付けるキーワード数の上限
+    'CONCURRENCY': 4,     # 同時に検索するキーワード数
+}
+
+# 人気キーワードの検索キャッシュの事前取得（manage.py prewarm_search_cache）
+SEARCH_PREWARM = {
+    'TOP_N': 50,         # 対象とする人気キーワード数
+    'WINDOW_DAYS': 7,    # この日数以内に検索されたキーワードのみ対象
+    'LEAD': 600,         # 有効期限までの残りがこの秒数以下のキャッシュを再取得する
+    'BUDGET': 300,       # 1回の実行で取得するページ数の上限（クロール予算）
+    'CONCURRENCY': 2,    # 同時に再取得する検索数
+    'INTERVAL': 300,     # 常駐時の実行間隔（秒）
+}
+
+# スクレイパーのHTMLパーサーバックエンド（'html.parser' / 'lxml' / 'selectolax'）
+# 依存パッケージがない場合は 'html.parser' にフォールバックする。スクレイパー毎に parser_backend で上書き可能
+SCRAPER_PARSER_BACKEND = 'lxml'
+
+# 検索結果の取得ページ数の上限（1ページ目を含む）。スクレイパー毎に max_pages で上書き可能
+# 2ページ目以降はスクレイパー毎に page_concurrency 件ずつ並行して取得する
+SCRAPER_MAX_PAGES = 3
+
+# HTMLパース・商品抽出を実行するエグゼキュータ（myapp.scrapers.executor）
+# KIND: 'process'（プロセスプール）/ 'thread'（スレッドプール）/ 'inline'（イベントループ上で実行）
+SCRAPER_PARSE_EXECUTOR = {
+    'KIND': 'process',
+    'MAX_WORKERS': None,      # Noneの場合はCPUコア数
+    'START_METHOD': 'spawn',
+}